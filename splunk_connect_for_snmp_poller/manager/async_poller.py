@@ -0,0 +1,251 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import asyncio
+import threading
+from dataclasses import dataclass, field
+from typing import Any, List, Optional
+
+from celery.utils.log import get_task_logger
+from pysnmp.hlapi import SnmpEngine
+from pysnmp.hlapi.varbinds import CommandGeneratorVarBinds
+from pysnmp.proto.rfc1902 import Null
+from pysnmp.proto.rfc1905 import endOfMibView
+
+from splunk_connect_for_snmp_poller.manager.const import DEFAULT_BULK_MAX_REPETITIONS
+from splunk_connect_for_snmp_poller.manager.task_utilities import transport_options
+
+logger = get_task_logger(__name__)
+
+GET = "get"
+BULK = "bulk"
+
+
+@dataclass
+class PollRequest:
+    """
+    One SNMP GET or BULK operation to be executed by the asyncio engine. The responses are stored in the same format
+    the synchronous getCmd/bulkCmd generators return them: a list of
+    (errorIndication, errorStatus, errorIndex, varBinds) tuples.
+    """
+
+    operation: str
+    host: str
+    port: int
+    auth_data: Any
+    context_data: Any
+    var_binds: list
+    address: Optional[str] = None
+    # overrides the max_repetitions of poll_requests() for a BULK request
+    max_repetitions: Optional[int] = None
+    timeout: Optional[float] = None
+    retries: Optional[int] = None
+    responses: List[tuple] = field(default_factory=list)
+
+
+def _asyncio_hlapi():
+    # imported lazily, pysnmp's asyncio hlapi is only needed by workers polling in batches
+    from pysnmp.hlapi import asyncio as asyncio_hlapi
+
+    return asyncio_hlapi
+
+
+_engines = threading.local()
+
+
+def get_async_engine():
+    """
+    Returns the event loop and the SnmpEngine bound to it, both created once per thread. The asyncio transport
+    attaches itself to the loop of the engine the first time it is used, so the engine can't be shared between loops.
+    """
+    if getattr(_engines, "snmp_engine", None) is None:
+        _engines.event_loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_engines.event_loop)
+        _engines.snmp_engine = SnmpEngine()
+    return _engines.event_loop, _engines.snmp_engine
+
+
+def close_async_engine():
+    """
+    Releases the event loop and the SnmpEngine of the current thread, for threads which don't live as long as the
+    process
+    """
+    snmp_engine = getattr(_engines, "snmp_engine", None)
+    if snmp_engine is None:
+        return
+    if snmp_engine.transportDispatcher is not None:
+        snmp_engine.transportDispatcher.closeDispatcher()
+        # let the cancelled timer task of the dispatcher finish before closing the loop
+        _engines.event_loop.run_until_complete(asyncio.sleep(0))
+    _engines.event_loop.close()
+    _engines.snmp_engine = None
+    _engines.event_loop = None
+
+
+def trim_bulk_table(var_bind_table, initial_vars, null_var_binds, previous_var_binds):
+    """
+    Replicates what the synchronous bulkCmd does with lexicographicMode=False on every response: columns which left
+    the requested subtree or reached the end of the MIB are marked with endOfMibView and the table is cut when all of
+    them are done. Returns the rows to report and whether the walk is over.
+    """
+    stop = True
+    for row in range(len(var_bind_table)):
+        stop = True
+        if len(var_bind_table[row]) != len(initial_vars):
+            var_bind_table = row and var_bind_table[: row - 1] or []
+            break
+        for col in range(len(var_bind_table[row])):
+            name, val = var_bind_table[row][col]
+            if row:
+                previous_var_binds = var_bind_table[row - 1]
+            if null_var_binds[col]:
+                var_bind_table[row][col] = previous_var_binds[col][0], endOfMibView
+                continue
+            stop = False
+            if isinstance(val, Null) or not initial_vars[col].isPrefixOf(name):
+                var_bind_table[row][col] = previous_var_binds[col][0], endOfMibView
+                null_var_binds[col] = True
+        if stop:
+            var_bind_table = row and var_bind_table[: row - 1] or []
+            break
+    return var_bind_table, stop
+
+
+async def _get(snmp_engine, request, transport_target):
+    asyncio_hlapi = _asyncio_hlapi()
+    response = await asyncio_hlapi.getCmd(
+        snmp_engine,
+        request.auth_data,
+        transport_target,
+        request.context_data,
+        *request.var_binds,
+    )
+    request.responses.append(response)
+
+
+async def _bulk(snmp_engine, request, transport_target, max_repetitions):
+    asyncio_hlapi = _asyncio_hlapi()
+    var_binds = request.var_binds
+    initial_vars = [
+        x[0] for x in CommandGeneratorVarBinds().makeVarBinds(snmp_engine, var_binds)
+    ]
+    null_var_binds = [False] * len(initial_vars)
+    while True:
+        (
+            error_indication,
+            error_status,
+            error_index,
+            var_bind_table,
+        ) = await asyncio_hlapi.bulkCmd(
+            snmp_engine,
+            request.auth_data,
+            transport_target,
+            request.context_data,
+            0,
+            max_repetitions,
+            *[(x[0], Null("")) for x in var_binds],
+        )
+        if error_indication or error_status:
+            if error_status == 2:
+                # noSuchName is reported the same way as the synchronous bulkCmd does
+                error_status = error_status.clone(0)
+                error_index = error_index.clone(0)
+            request.responses.append(
+                (
+                    error_indication,
+                    error_status,
+                    error_index,
+                    var_bind_table and var_bind_table[0] or [],
+                )
+            )
+            return
+        var_bind_table, stop = trim_bulk_table(
+            var_bind_table, initial_vars, null_var_binds, var_binds
+        )
+        for row in var_bind_table:
+            request.responses.append((error_indication, error_status, error_index, row))
+        if stop or not var_bind_table:
+            return
+        var_binds = var_bind_table[-1]
+
+
+async def _poll_all(
+    snmp_engine, requests, max_in_flight, max_in_flight_per_target, max_repetitions
+):
+    asyncio_hlapi = _asyncio_hlapi()
+    in_flight = asyncio.Semaphore(max_in_flight)
+    per_target = {}
+
+    async def poll(request):
+        target = per_target.setdefault(
+            (request.host, request.port), asyncio.Semaphore(max_in_flight_per_target)
+        )
+        async with target, in_flight:
+            transport_target = asyncio_hlapi.UdpTransportTarget(
+                (request.address or request.host, request.port),
+                **transport_options(request.timeout, request.retries),
+            )
+            if request.operation == BULK:
+                await _bulk(
+                    snmp_engine,
+                    request,
+                    transport_target,
+                    request.max_repetitions or max_repetitions,
+                )
+            else:
+                await _get(snmp_engine, request, transport_target)
+
+    return await asyncio.gather(
+        *[poll(request) for request in requests], return_exceptions=True
+    )
+
+
+def poll_requests(
+    requests,
+    max_in_flight,
+    max_in_flight_per_target,
+    max_repetitions=DEFAULT_BULK_MAX_REPETITIONS,
+    deadline=None,
+):
+    """
+    Executes all the requests concurrently, with at most max_in_flight of them waiting for a device and at most
+    max_in_flight_per_target for the same device. Responses are stored in every request, exceptions are logged and
+    leave the request without responses. When deadline (in seconds) passes, the requests still running are cancelled.
+    """
+    event_loop, snmp_engine = get_async_engine()
+    try:
+        results = event_loop.run_until_complete(
+            asyncio.wait_for(
+                _poll_all(
+                    snmp_engine,
+                    requests,
+                    max_in_flight,
+                    max_in_flight_per_target,
+                    max_repetitions,
+                ),
+                deadline,
+            )
+        )
+    except asyncio.TimeoutError:
+        logger.warning(
+            f"Polling of {len(requests)} SNMP requests did not finish in {deadline} seconds"
+        )
+        return
+    for request, result in zip(requests, results):
+        if isinstance(result, Exception):
+            logger.error(
+                f"Error occurred while polling {request.host}:{request.port} with SNMP {request.operation}: "
+                f"{result}"
+            )
@@ -0,0 +1,91 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import os
+import time
+
+from pysnmp.proto import errind
+
+from splunk_connect_for_snmp_poller.manager.const import (
+    DEFAULT_CIRCUIT_BREAKER_BACKOFF,
+    DEFAULT_CIRCUIT_BREAKER_MAX_BACKOFF,
+    DEFAULT_CIRCUIT_BREAKER_THRESHOLD,
+)
+
+
+class CircuitBreaker:
+    """
+    Stops polling devices which don't answer. After threshold consecutive polls of a device timed out, its breaker
+    opens and the polls of the device are skipped for backoff seconds. The first poll after that is a probe: an answer
+    closes the breaker, another timeout opens it again for twice as long, up to max_backoff seconds.
+    The state of a device is a dictionary {"failures": ..., "openUntil": ...} stored by the WalkedHostsRepository, so
+    it is shared by all the workers, None means the device has no failures.
+    """
+
+    def __init__(self, threshold, backoff, max_backoff, clock=time.time):
+        self._threshold = threshold
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._clock = clock
+
+    def is_open(self, state):
+        return state is not None and state.get("openUntil", 0) > self._clock()
+
+    def next_state(self, state, answered):
+        """
+        Returns the state of a device after a poll, answered tells whether the device responded
+        """
+        if answered or not self._threshold:
+            return None
+        failures = (state or {}).get("failures", 0) + 1
+        next_state = {"failures": failures}
+        if failures >= self._threshold:
+            backoff = self._backoff * 2 ** (failures - self._threshold)
+            next_state["openUntil"] = self._clock() + min(self._max_backoff, backoff)
+        return next_state
+
+    def updated_states(self, states, answers):
+        """
+        Returns the states which have to be stored after the polls. states are the states of the devices before the
+        polls and answers a dictionary device -> whether it responded.
+        """
+        updated = {}
+        for host, answered in answers.items():
+            next_state = self.next_state(states.get(host), answered)
+            if next_state != states.get(host):
+                updated[host] = next_state
+        return updated
+
+
+def answered(responses):
+    """
+    Tells whether the device responded to a request, given the responses stored by the asyncio engine. Only timeouts
+    count as no answer, other errors mean the device is reachable.
+    """
+    return any(
+        not isinstance(error_indication, errind.RequestTimedOut)
+        for error_indication, _, _, _ in responses
+    )
+
+
+circuit_breaker = CircuitBreaker(
+    int(os.environ.get("CIRCUIT_BREAKER_THRESHOLD", DEFAULT_CIRCUIT_BREAKER_THRESHOLD)),
+    int(os.environ.get("CIRCUIT_BREAKER_BACKOFF", DEFAULT_CIRCUIT_BREAKER_BACKOFF)),
+    int(
+        os.environ.get(
+            "CIRCUIT_BREAKER_MAX_BACKOFF", DEFAULT_CIRCUIT_BREAKER_MAX_BACKOFF
+        )
+    ),
+)
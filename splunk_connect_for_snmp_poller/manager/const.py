@@ -38,3 +38,48 @@ PrivProtocolMap = {
 }
 
 DEFAULT_POLLING_FREQUENCY = 60
+DEFAULT_BULK_MAX_REPETITIONS = 50
+# Bounds of the max-repetitions learned for every device from its BULK responses
+BULK_MAX_REPETITIONS_LOWER_LIMIT = 5
+BULK_MAX_REPETITIONS_UPPER_LIMIT = 200
+# Rows requested by every GETBULK of a walk, overridden by walk.maxRepetitions in config.yaml
+DEFAULT_WALK_MAX_REPETITIONS = 25
+# Maximum random delay in seconds added to every run of a polling job
+DEFAULT_SCHEDULE_JITTER = 0
+# Maximum number of inventory records sent to a worker in one polling task
+DEFAULT_DISPATCH_BATCH_SIZE = 100
+# Seconds a resolved (or failed) inventory hostname is remembered, and number of parallel lookups
+DEFAULT_DNS_CACHE_TTL = 300
+DEFAULT_DNS_NEGATIVE_CACHE_TTL = 30
+DEFAULT_DNS_RESOLVER_THREADS = 16
+
+# Thresholds for buffered HEC delivery, a batch is flushed as soon as any of them is reached
+DEFAULT_HEC_BATCH_MAX_COUNT = 500
+DEFAULT_HEC_BATCH_MAX_SIZE = 1024 * 1024
+DEFAULT_HEC_BATCH_MAX_AGE = 5
+
+# Connection pool used by HecSender, created once per worker process
+DEFAULT_HEC_POOL_SIZE = 10
+DEFAULT_HEC_RETRIES = 3
+DEFAULT_HEC_BACKOFF_FACTOR = 0.5
+
+# Connection pool used for MIB server translations, created once per worker process
+DEFAULT_MIB_SERVER_POOL_SIZE = 10
+DEFAULT_MIB_SERVER_TIMEOUT = 60
+
+# Seconds between checks of local MIB files for changes, the cached MIB view is rebuilt when they change
+DEFAULT_MIB_VIEW_CHECK_INTERVAL = 60
+
+# Local cache of MIB server translations, size 0 disables it
+DEFAULT_TRANSLATION_CACHE_SIZE = 100000
+DEFAULT_TRANSLATION_CACHE_TTL = 3600
+
+# Limits of concurrent SNMP requests in a batch polled with the asyncio engine
+DEFAULT_ASYNC_MAX_IN_FLIGHT = 100
+DEFAULT_ASYNC_MAX_IN_FLIGHT_PER_TARGET = 1
+
+# Consecutive timed out polls after which the polls of a device are skipped, 0 disables the circuit breaker, and the
+# initial and maximum number of seconds the polls are skipped for
+DEFAULT_CIRCUIT_BREAKER_THRESHOLD = 3
+DEFAULT_CIRCUIT_BREAKER_BACKOFF = 60
+DEFAULT_CIRCUIT_BREAKER_MAX_BACKOFF = 3600
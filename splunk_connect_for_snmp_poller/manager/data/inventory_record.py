@@ -14,6 +14,7 @@
 #
 import json
 from dataclasses import dataclass
+from typing import Optional
 
 from splunk_connect_for_snmp_poller.manager.data.event_builder import EventField
 
@@ -25,6 +26,11 @@ class InventoryRecord:
     community: str
     profile: str
     frequency_str: str
+    # address the host was resolved to when the inventory was loaded, so it is not resolved again for every poll
+    address: Optional[str] = None
+    # SNMP timeout in seconds and number of retries, the pysnmp defaults are used when they are not set
+    timeout: Optional[float] = None
+    retries: Optional[int] = None
 
     def to_json(self) -> str:
         return json.dumps(self, default=lambda o: o.__dict__)
@@ -0,0 +1,54 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from types import MappingProxyType
+from typing import Dict, Optional
+
+from splunk_connect_for_snmp_poller.manager.data.inventory_record import InventoryRecord
+
+
+class InventorySnapshot:
+    """
+    Read-only view of a parsed inventory, shared by the poller and the realtime sweep. The records are indexed by
+    their entry key (host#profile), by host and by profile. version identifies the content of the inventory file and
+    profiles are the profiles the polling frequencies were taken from, together they tell whether the snapshot has to
+    be rebuilt. The records must not be modified, make a copy with dataclasses.replace() instead.
+    """
+
+    def __init__(
+        self,
+        version: Optional[str] = None,
+        records: Optional[Dict[str, InventoryRecord]] = None,
+        profiles=None,
+    ):
+        self.version = version
+        self.profiles = profiles
+        self.records = MappingProxyType(dict(records or {}))
+        by_host, by_profile = {}, {}
+        for ir in self.records.values():
+            by_host.setdefault(ir.host, []).append(ir)
+            by_profile.setdefault(ir.profile, []).append(ir)
+        self.by_host = MappingProxyType(
+            {host: tuple(records) for host, records in by_host.items()}
+        )
+        self.by_profile = MappingProxyType(
+            {profile: tuple(records) for profile, records in by_profile.items()}
+        )
+
+    def __len__(self):
+        return len(self.records)
+
+    def __repr__(self):
+        return f"InventorySnapshot(version={self.version}, records={len(self.records)})"
@@ -0,0 +1,119 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from splunk_connect_for_snmp_poller.manager.const import DEFAULT_DISPATCH_BATCH_SIZE
+from splunk_connect_for_snmp_poller.manager.data.inventory_record import InventoryRecord
+from splunk_connect_for_snmp_poller.manager.tasks import snmp_polling_batch
+from splunk_connect_for_snmp_poller.mongo import ConfigRepository
+
+logger = logging.getLogger(__name__)
+
+
+class _PendingBatch:
+    def __init__(self, server_config, splunk_indexes, profiles):
+        self.server_config = server_config
+        self.splunk_indexes = splunk_indexes
+        self.profiles = profiles
+        self.ir_jsons = []
+
+
+class BatchDispatcher:
+    """
+    Collects the polls which are due in the same scheduler tick and sends them to the workers as snmp_polling_batch
+    tasks of at most batch_size inventory records. Polls are grouped by the config they were scheduled with: all the
+    jobs created by one inventory refresh share the same server_config and profiles objects. Instead of the config
+    itself, tasks carry its version from the ConfigRepository.
+    """
+
+    MAX_CONFIG_VERSIONS = 16
+
+    def __init__(self, batch_size):
+        self._batch_size = batch_size
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._config_versions = OrderedDict()
+
+    def add(self, ir: InventoryRecord, server_config, splunk_indexes, profiles):
+        key = (id(server_config), id(profiles), tuple(sorted(splunk_indexes.items())))
+        with self._lock:
+            batch = self._pending.get(key)
+            if batch is None:
+                batch = _PendingBatch(server_config, splunk_indexes, profiles)
+                self._pending[key] = batch
+            batch.ir_jsons.append(ir.to_json())
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for key, batch in pending.items():
+            # a requeued poll and a poll added meanwhile for the same inventory record are sent once, so the pending
+            # polls don't pile up while the dispatching keeps failing
+            batch.ir_jsons = list(dict.fromkeys(batch.ir_jsons))
+            sent = 0
+            try:
+                config_version = self._config_version(key[:2], batch)
+                for start in range(0, len(batch.ir_jsons), self._batch_size):
+                    end = start + self._batch_size
+                    ir_jsons = batch.ir_jsons[start:end]
+                    logger.debug(f"Dispatching a batch of {len(ir_jsons)} polls")
+                    snmp_polling_batch.delay(
+                        ir_jsons,
+                        batch.server_config["mongo"],
+                        config_version,
+                        batch.splunk_indexes,
+                    )
+                    sent = end
+            except Exception:
+                logger.exception(
+                    f"Error while dispatching {len(batch.ir_jsons) - sent} polls, retrying them with the next flush"
+                )
+                self._requeue(key, batch, batch.ir_jsons[sent:])
+
+    def _requeue(self, key, batch, ir_jsons):
+        with self._lock:
+            current = self._pending.get(key)
+            if current is None:
+                batch.ir_jsons = ir_jsons
+                self._pending[key] = batch
+            else:
+                current.ir_jsons = ir_jsons + current.ir_jsons
+
+    def _config_version(self, key, batch):
+        # the config objects are kept with their version, so their ids can't be reused while they are in the cache
+        cached = self._config_versions.get(key)
+        if cached is not None:
+            self._config_versions.move_to_end(key)
+            return cached[2]
+        config_version = ConfigRepository(batch.server_config["mongo"]).store(
+            batch.server_config, batch.profiles
+        )
+        self._config_versions[key] = (
+            batch.server_config,
+            batch.profiles,
+            config_version,
+        )
+        while len(self._config_versions) > BatchDispatcher.MAX_CONFIG_VERSIONS:
+            self._config_versions.popitem(last=False)
+        return config_version
+
+
+task_dispatcher = BatchDispatcher(
+    int(os.environ.get("DISPATCH_BATCH_SIZE", DEFAULT_DISPATCH_BATCH_SIZE))
+)
@@ -14,11 +14,22 @@
 #    limitations under the License.
 #   ########################################################################
 import json
+import threading
 import time
 
 import requests
 from celery.utils.log import get_logger
-
+from requests.adapters import HTTPAdapter
+from urllib3 import Retry
+
+from splunk_connect_for_snmp_poller.manager.const import (
+    DEFAULT_HEC_BACKOFF_FACTOR,
+    DEFAULT_HEC_BATCH_MAX_AGE,
+    DEFAULT_HEC_BATCH_MAX_COUNT,
+    DEFAULT_HEC_BATCH_MAX_SIZE,
+    DEFAULT_HEC_POOL_SIZE,
+    DEFAULT_HEC_RETRIES,
+)
 from splunk_connect_for_snmp_poller.manager.data.event_builder import (
     EventBuilder,
     EventField,
@@ -30,29 +41,134 @@ from splunk_connect_for_snmp_poller.manager.static.mib_enricher import MibEnrich
 logger = get_logger(__name__)
 
 
+class HecBatch:
+    """
+    HEC accepts several events in one request when they are concatenated in the body, so instead of posting every
+    varbind separately we keep already serialized events here until one of the thresholds is reached.
+    """
+
+    def __init__(self):
+        self.payloads = []
+        self.size = 0
+        self.created = None
+
+    def add(self, payload: str):
+        if not self.payloads:
+            self.created = time.time()
+        self.payloads.append(payload)
+        self.size += len(payload) + 1
+
+    def is_full(self, max_count, max_size, max_age) -> bool:
+        return (
+            len(self.payloads) >= max_count
+            or self.size >= max_size
+            or time.time() - self.created >= max_age
+        )
+
+    def drain(self) -> list:
+        payloads = self.payloads
+        self.payloads = []
+        self.size = 0
+        self.created = None
+        return payloads
+
+
 class HecSender:
-    def __init__(self, metrics_endpoint, logs_endpoint):
+    def __init__(
+        self,
+        metrics_endpoint,
+        logs_endpoint,
+        buffered=False,
+        max_batch_count=DEFAULT_HEC_BATCH_MAX_COUNT,
+        max_batch_size=DEFAULT_HEC_BATCH_MAX_SIZE,
+        max_batch_age=DEFAULT_HEC_BATCH_MAX_AGE,
+        pool_size=DEFAULT_HEC_POOL_SIZE,
+        retries=DEFAULT_HEC_RETRIES,
+        backoff_factor=DEFAULT_HEC_BACKOFF_FACTOR,
+    ):
         logger.debug(f"[-] logs : {logs_endpoint}, metrics : {metrics_endpoint}")
         self.metrics_endpoint = metrics_endpoint
         self.logs_endpoint = logs_endpoint
+        self.buffered = buffered
+        self.max_batch_count = max_batch_count
+        self.max_batch_size = max_batch_size
+        self.max_batch_age = max_batch_age
+        self._batches = {True: HecBatch(), False: HecBatch()}
+        self._lock = threading.Lock()
+        self._session = HecSender.create_session(pool_size, retries, backoff_factor)
+
+    @staticmethod
+    def create_session(pool_size, retries, backoff_factor) -> requests.Session:
+        """
+        HecSender is meant to live as long as the worker process, so the connections kept by this session are reused
+        (keep-alive) between tasks instead of opening a new TCP/TLS connection for every request. pool_block makes
+        the pool a hard limit on concurrent connections to each HEC endpoint.
+        """
+        retry_strategy = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=[429, 500, 502, 503, 504],
+            method_whitelist=["POST"],
+            # the last response is returned when retries run out, like it is without retries
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=retry_strategy,
+            pool_block=True,
+        )
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def close(self):
+        self.flush()
+        self._session.close()
 
     def send_hec_request(self, is_metric: bool, data):
+        if self.buffered:
+            return self.buffer_hec_request(is_metric, data)
         if is_metric:
             return self.send_metric_request(data)
         else:
             return self.send_event_request(data)
 
     def send_event_request(self, data):
-        return HecSender.send_request(self.logs_endpoint, data)
+        return self.send_request(self.logs_endpoint, data)
 
     def send_metric_request(self, data):
-        return HecSender.send_request(self.metrics_endpoint, data)
-
-    @staticmethod
-    def send_request(endpoint, data):
+        return self.send_request(self.metrics_endpoint, data)
+
+    def buffer_hec_request(self, is_metric: bool, data):
+        with self._lock:
+            batch = self._batches[is_metric]
+            batch.add(json.dumps(data))
+            if not batch.is_full(
+                self.max_batch_count, self.max_batch_size, self.max_batch_age
+            ):
+                return None
+            payloads = batch.drain()
+        return self.send_batch_request(self._endpoint_for(is_metric), payloads)
+
+    def flush(self):
+        """
+        Sends everything that is still buffered, it has to be called at the end of every task using buffered mode.
+        """
+        for is_metric in (True, False):
+            with self._lock:
+                payloads = self._batches[is_metric].drain()
+            if payloads:
+                self.send_batch_request(self._endpoint_for(is_metric), payloads)
+
+    def _endpoint_for(self, is_metric: bool):
+        return self.metrics_endpoint if is_metric else self.logs_endpoint
+
+    def send_request(self, endpoint, data):
         try:
             logger.debug("+++++++++endpoint+++++++++\n%s", endpoint)
-            response = requests.post(url=endpoint, json=data, timeout=60)
+            response = self._session.post(url=endpoint, json=data, timeout=60)
             logger.debug("Response code is %s", response.status_code)
             logger.debug("Response is %s", response.text)
             return response
@@ -60,6 +176,33 @@ class HecSender:
             logger.error(
                 f"Connection error when sending data to HEC index - {data['index']}: {e}"
             )
+        except requests.RequestException as e:
+            logger.error(f"Error when sending data to HEC index - {data['index']}: {e}")
+
+    def send_batch_request(self, endpoint, payloads: list):
+        try:
+            logger.debug(
+                "+++++++++endpoint+++++++++\n%s, batch of %d events",
+                endpoint,
+                len(payloads),
+            )
+            response = self._session.post(
+                url=endpoint,
+                data="\n".join(payloads),
+                headers={"Content-Type": "application/json"},
+                timeout=60,
+            )
+            logger.debug("Response code is %s", response.status_code)
+            logger.debug("Response is %s", response.text)
+            return response
+        except requests.ConnectionError as e:
+            logger.error(
+                f"Connection error when sending batch of {len(payloads)} events to HEC - {endpoint}: {e}"
+            )
+        except requests.RequestException as e:
+            logger.error(
+                f"Error when sending batch of {len(payloads)} events to HEC - {endpoint}: {e}"
+            )
 
 
 def post_data_to_splunk_hec(
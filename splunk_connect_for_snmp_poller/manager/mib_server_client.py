@@ -16,15 +16,209 @@
 import json
 import logging
 import os
+import threading
 import time
+from collections import OrderedDict
 
 import requests as requests
 from requests.adapters import HTTPAdapter
 from urllib3 import Retry
 
+from splunk_connect_for_snmp_poller.manager.const import (
+    DEFAULT_MIB_SERVER_POOL_SIZE,
+    DEFAULT_MIB_SERVER_TIMEOUT,
+    DEFAULT_TRANSLATION_CACHE_SIZE,
+    DEFAULT_TRANSLATION_CACHE_TTL,
+)
+
 logger = logging.getLogger(__name__)
 
 
+class TranslationClient:
+    """
+    Long-living client for the MIB server. Translation is executed for every polled value, so instead of building
+    a new retrying session per request, one pooled session is kept for the whole worker process.
+    """
+
+    def __init__(
+        self, pool_size=DEFAULT_MIB_SERVER_POOL_SIZE, timeout=DEFAULT_MIB_SERVER_TIMEOUT
+    ):
+        retry_strategy = Retry(
+            total=3,
+            backoff_factor=1,
+            status_forcelist=[429, 500, 502, 503, 504],
+            method_whitelist=["GET", "POST"],
+        )
+        self._adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=retry_strategy,
+        )
+        self._session = requests.Session()
+        self._session.mount("https://", self._adapter)
+        self._session.mount("http://", self._adapter)
+        self.timeout = timeout
+
+    def post(self, url, **kwargs):
+        return self._session.post(url, timeout=self.timeout, **kwargs)
+
+    def pool_statistics(self):
+        """
+        @return: number of requests sent through the pool, connections opened for them and requests that reused
+        an already opened connection
+        """
+        pools = self._adapter.poolmanager.pools
+        connection_pools = [pools[key] for key in pools.keys()]
+        requests_sent = sum(pool.num_requests for pool in connection_pools)
+        connections = sum(pool.num_connections for pool in connection_pools)
+        return {
+            "requests": requests_sent,
+            "connections": connections,
+            "pool_hits": requests_sent - connections,
+        }
+
+    def close(self):
+        logger.info(f"Closing MIB server client, statistics: {self.pool_statistics()}")
+        self._session.close()
+
+
+class TranslationCache:
+    """
+    LRU cache with TTL for MIB server translations. Between polls the OIDs and their types stay the same and only
+    the values change, so:
+    * METRIC translations are stored as templates keyed by OID and types, the current value is put into "_value"
+      locally. A template is only created when the MIB server returned the value unchanged.
+    * other formats embed the value in several places, so they are stored together with the value they were
+      translated for.
+    """
+
+    def __init__(
+        self, max_size=DEFAULT_TRANSLATION_CACHE_SIZE, ttl=DEFAULT_TRANSLATION_CACHE_TTL
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, var_bind, data_format):
+        if not self.max_size:
+            return None
+        oid, oid_type, value, value_type = _var_bind_key(var_bind)
+        with self._lock:
+            template = self._lookup((oid, oid_type, value_type, data_format))
+            if template is not None:
+                self.hits += 1
+                metric = dict(template)
+                metric["_value"] = value
+                return json.dumps(metric)
+            translation = self._lookup((oid, oid_type, value_type, data_format, value))
+            if translation is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return translation
+
+    def put(self, var_bind, data_format, translation):
+        if not self.max_size:
+            return
+        oid, oid_type, value, value_type = _var_bind_key(var_bind)
+        template = None
+        if data_format == "METRIC":
+            try:
+                template = json.loads(translation)
+            except ValueError:
+                pass
+        with self._lock:
+            if isinstance(template, dict) and template.get("_value") == value:
+                self._store((oid, oid_type, value_type, data_format), template)
+            else:
+                self._store(
+                    (oid, oid_type, value_type, data_format, value), translation
+                )
+
+    def statistics(self):
+        """
+        @return: number of cached translations, lookups answered from the cache and lookups that had to go to the MIB
+        server
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _store(self, key, value):
+        self._entries[key] = (time.time() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+def _var_bind_key(var_bind):
+    name, val = var_bind
+    value_type = val.__class__.__name__
+    return (
+        str(name),
+        name.__class__.__name__,
+        format_value_for_mib_server(val, value_type),
+        value_type,
+    )
+
+
+translation_cache = TranslationCache(
+    int(os.environ.get("TRANSLATION_CACHE_SIZE", DEFAULT_TRANSLATION_CACHE_SIZE)),
+    float(os.environ.get("TRANSLATION_CACHE_TTL", DEFAULT_TRANSLATION_CACHE_TTL)),
+)
+
+_translation_client = None
+_translation_client_lock = threading.Lock()
+
+
+def init_translation_client():
+    global _translation_client
+    with _translation_client_lock:
+        if _translation_client is None:
+            _translation_client = TranslationClient(
+                int(
+                    os.environ.get("MIB_SERVER_POOL_SIZE", DEFAULT_MIB_SERVER_POOL_SIZE)
+                ),
+                float(os.environ.get("MIB_SERVER_TIMEOUT", DEFAULT_MIB_SERVER_TIMEOUT)),
+            )
+    return _translation_client
+
+
+def get_translation_client() -> TranslationClient:
+    if _translation_client is None:
+        return init_translation_client()
+    return _translation_client
+
+
+def close_translation_client():
+    global _translation_client
+    with _translation_client_lock:
+        if _translation_client is not None:
+            _translation_client.close()
+            _translation_client = None
+
+
 def get_translation(var_binds, mib_server_url, data_format):
     """
     @param var_binds: var_binds object getting from SNMP agents
@@ -32,10 +226,18 @@ def get_translation(var_binds, mib_server_url, data_format):
     @param data_format: format of data
     @return: translated string
     """
+    cacheable = len(var_binds) == 1
+    if cacheable:
+        translation = translation_cache.get(var_binds[0], data_format)
+        if translation is not None:
+            return translation
     payload = prepare_payload(var_binds)
 
     try:
-        return get_url(mib_server_url, payload, data_format)
+        translation = get_url(mib_server_url, payload, data_format)
+        if cacheable:
+            translation_cache.put(var_binds[0], data_format, translation)
+        return translation
     except requests.Timeout:
         logger.exception("Time out occurred during call to MIB Server")
         raise
@@ -64,7 +266,7 @@ def prepare_payload(var_binds):
     return payload
 
 
-class SharedException(object):
+class SharedException(Exception):
     pass
 
 
@@ -78,20 +280,12 @@ def get_url(mib_server_url, payload, data_format):
     params = {"data_format": data_format}
 
     try:
-        # use Session with Retry
-        retry_strategy = Retry(
-            total=3,
-            backoff_factor=1,
-            status_forcelist=[429, 500, 502, 503, 504],
-            method_whitelist=["GET", "POST"],
-        )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        session = requests.Session()
-        session.mount("https://", adapter)
-        session.mount("http://", adapter)
-        resp = session.post(
-            translation_url, headers=headers, data=payload, params=params, timeout=60
+        client = get_translation_client()
+        resp = client.post(
+            translation_url, headers=headers, data=payload, params=params
         )
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[-] MIB server pool: %s", client.pool_statistics())
 
     except Exception as e:
         logger.error(
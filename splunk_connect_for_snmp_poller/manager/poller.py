@@ -14,21 +14,23 @@
 # limitations under the License.
 #
 import copy
-import functools
 import logging.config
 import threading
-import time
-
-import schedule
-from pysnmp.hlapi import SnmpEngine
 
 from splunk_connect_for_snmp_poller.manager.data.inventory_record import InventoryRecord
+from splunk_connect_for_snmp_poller.manager.data.inventory_snapshot import (
+    InventorySnapshot,
+)
+from splunk_connect_for_snmp_poller.manager.dispatcher import task_dispatcher
 from splunk_connect_for_snmp_poller.manager.poller_utilities import (
     automatic_onetime_task,
     automatic_realtime_job,
     create_poller_enricher_entry_key,
     create_poller_scheduler_entry_key,
-    parse_inventory_file,
+    diff_inventory,
+    get_transport_setting,
+    load_inventory_snapshot,
+    refresh_inventory_addresses,
     return_database_id,
     update_enricher_config,
     update_inventory_record,
@@ -38,6 +40,7 @@ from splunk_connect_for_snmp_poller.manager.profile_matching import (
     extract_desc,
     get_profiles,
 )
+from splunk_connect_for_snmp_poller.manager.scheduler import job_scheduler
 from splunk_connect_for_snmp_poller.manager.task_utilities import translate_list_to_oid
 from splunk_connect_for_snmp_poller.manager.tasks import snmp_polling
 from splunk_connect_for_snmp_poller.manager.validator.inventory_validator import (
@@ -70,15 +73,19 @@ class Poller:
         self._enricher_jobs_map = {}
         self._dynamic_jobs = set()
         self._mongo = WalkedHostsRepository(self._server_config["mongo"])
-        self._local_snmp_engine = SnmpEngine()
         self._unmatched_devices = {}
         self._lock = threading.Lock()
         self._force_refresh = False
         self._old_enricher = {}
+        self._profiles = None
+        self._inventory_snapshot = InventorySnapshot()
 
     def force_inventory_refresh(self):
         self._force_refresh = True
 
+    def inventory_snapshot(self) -> InventorySnapshot:
+        return self._inventory_snapshot
+
     def __get_splunk_indexes(self):
         return {
             "event_index": self._args.event_index,
@@ -87,16 +94,12 @@ class Poller:
         }
 
     def run(self):
+        self._mongo.check_server_version()
+        # the inventory is loaded first, the realtime sweep works on its snapshot
+        self.__check_inventory()
         self.__start_realtime_scheduler_task()
-        counter = 0
-        while True:
-            if counter == 0:
-                self.__check_inventory()
-                counter = self._args.refresh_interval
-
-            schedule.run_pending()
-            time.sleep(1)
-            counter -= 1
+        job_scheduler.every(self._args.refresh_interval, self.__check_inventory)
+        job_scheduler.run_forever(after_run_pending=task_dispatcher.flush)
 
     def __check_inventory(self):
         server_config_modified, self._config_mod_time = file_was_modified(
@@ -108,53 +111,71 @@ class Poller:
             self._args.inventory, self._inventory_mod_time
         )
 
-        # update job when either inventory changes or config changes
-        if server_config_modified or inventory_config_modified or self._force_refresh:
+        reload = (
+            server_config_modified or inventory_config_modified or self._force_refresh
+        )
+        # without a reload, the hostnames are still resolved again once their addresses expire
+        snapshot = (
+            None if reload else refresh_inventory_addresses(self._inventory_snapshot)
+        )
+        addresses_changed = (
+            snapshot is not None and snapshot is not self._inventory_snapshot
+        )
+
+        # update job when either inventory changes, config changes or addresses of the hosts change
+        if reload or addresses_changed:
+            force_refresh = self._force_refresh
             self._force_refresh = False
             logger.info(
                 f"Refreshing inventory and config: server_config_modified = {server_config_modified}, "
                 f"inventory_config_modified = {inventory_config_modified}, "
-                f"force_refresh = {self._force_refresh}"
+                f"force_refresh = {force_refresh}, addresses_changed = {addresses_changed}"
             )
 
-            # TODO should rethink logic with changed to profiles and oids
-            inventory_entry_keys = set()
-            inventory_hosts = set()
-            inventory_hosts_with_snmp_data = {}
             new_enricher = self._server_config.get("enricher", {})
-            profiles = get_profiles(self._server_config)
-            for ir in parse_inventory_file(self._args.inventory, profiles):
-                entry_key = create_poller_scheduler_entry_key(ir.host, ir.profile)
-                if entry_key in inventory_entry_keys:
-                    logger.error(
-                        "%s has duplicated hostname %s and %s in the inventory, cannot use the same profile twice for "
-                        "the same device",
-                        ir.__repr__(),
-                        ir.host,
-                        ir.profile,
+            if server_config_modified or force_refresh or self._profiles is None:
+                self._profiles = get_profiles(self._server_config)
+            if reload:
+                snapshot = refresh_inventory_addresses(
+                    load_inventory_snapshot(
+                        self._args.inventory, self._profiles, self._inventory_snapshot
                     )
-                    continue
-                inventory_entry_keys.add(entry_key)
-                ir_host = return_database_id(ir.host)
-                inventory_hosts.add(ir_host)
-                inventory_hosts_with_snmp_data[ir_host] = copy.deepcopy(ir)
+                )
+            inventory = snapshot.records
+            diff = diff_inventory(self._inventory_snapshot.records, inventory)
+            logger.info(
+                f"Inventory changes: added = {len(diff.added)}, removed = {len(diff.removed)}, "
+                f"changed = {len(diff.changed)}"
+            )
+            # profiles may have changed, so rows which are not scheduled (dynamic ones or with a missing profile)
+            # have to be evaluated again
+            reevaluate = server_config_modified or force_refresh
+            inventory_hosts = set()
+            for entry_key, ir in inventory.items():
+                inventory_hosts.add(return_database_id(ir.host))
+                modified = entry_key in diff.added or entry_key in diff.changed
                 if ir.profile == DYNAMIC_PROFILE:
-                    self.delete_all_dynamic_entries_per_host(ir.host)
-                    self.add_device_for_profile_matching(ir)
-                    self.check_if_new_host_was_added(entry_key, ir, new_enricher)
-                else:
-                    if entry_key not in self._jobs_map:
-                        self.process_new_job(entry_key, ir, profiles)
+                    if modified or reevaluate:
+                        self.delete_all_dynamic_entries_per_host(ir.host)
+                        self.add_device_for_profile_matching(ir)
                         self.check_if_new_host_was_added(entry_key, ir, new_enricher)
-                    else:
-                        self.update_schedule_for_changed_conf(entry_key, ir, profiles)
+                elif entry_key not in self._jobs_map:
+                    if modified or reevaluate:
+                        self.process_new_job(entry_key, ir, self._profiles)
+                        self.check_if_new_host_was_added(entry_key, ir, new_enricher)
+                elif entry_key in diff.changed:
+                    self.__update_schedule(entry_key, ir)
 
             if server_config_modified:
                 if new_enricher != self._old_enricher:
+                    inventory_hosts_with_snmp_data = {
+                        return_database_id(ir.host): ir for ir in inventory.values()
+                    }
                     self.run_enricher_changed_check(
-                        new_enricher, inventory_hosts_with_snmp_data
+                        new_enricher, copy.deepcopy(inventory_hosts_with_snmp_data)
                     )
-            self.clean_job_inventory(inventory_entry_keys, inventory_hosts)
+            self.clean_job_inventory(diff.removed, inventory_hosts)
+            self._inventory_snapshot = snapshot
 
     def check_if_new_host_was_added(self, host_key, inventory_record, new_enricher):
         ir_host = return_database_id(host_key)
@@ -198,7 +219,7 @@ class Poller:
         for entry_key in list(self._jobs_map.keys()):
             if entry_key.split("#")[0] == host and entry_key in self._dynamic_jobs:
                 logger.debug("Removing job for %s", entry_key)
-                schedule.cancel_job(self._jobs_map.get(entry_key))
+                job_scheduler.cancel_job(self._jobs_map.get(entry_key))
                 del self._jobs_map[entry_key]
                 self._dynamic_jobs.remove(entry_key)
 
@@ -206,42 +227,27 @@ class Poller:
         for entry_key in list(self._enricher_jobs_map.keys()):
             if entry_key.split("#")[0] == host:
                 logger.debug("Removing job for %s", entry_key)
-                schedule.cancel_job(self._enricher_jobs_map.get(entry_key))
+                job_scheduler.cancel_job(self._enricher_jobs_map.get(entry_key))
                 del self._enricher_jobs_map[entry_key]
 
-    def clean_job_inventory(self, inventory_entry_keys: set, inventory_hosts: set):
-        for entry_key in list(self._jobs_map):
-            if entry_key not in inventory_entry_keys:
-                logger.debug("Removing job for %s", entry_key)
-                schedule.cancel_job(self._jobs_map.get(entry_key))
-                db_host_id = return_database_id(entry_key)
-                if db_host_id not in inventory_hosts:
-                    logger.info(
-                        "Removing _id %s from mongo database, it is not in used hosts %s",
-                        db_host_id,
-                        str(inventory_hosts),
-                    )
-                    self._mongo.delete_host(db_host_id)
-                    self.delete_all_enricher_entries_per_host(db_host_id)
-                    self._mongo.delete_onetime_walk_result(db_host_id)
-                del self._jobs_map[entry_key]
-
-    def update_schedule_for_changed_conf(self, entry_key, ir, profiles):
-        old_conf = self._jobs_map.get(entry_key).job_func.args
-        if self.is_conf_changed(entry_key, ir, old_conf):
-            self.__update_schedule(
-                ir, self._server_config, self.__get_splunk_indexes(), profiles
-            )
-
-    def is_conf_changed(self, entry_key, ir, old_conf):
-        interval = self._jobs_map.get(entry_key).interval
-        config = self._server_config
-        indexes = self.__get_splunk_indexes()
-        frequency = int(ir.frequency_str)
-        return (
-            old_conf != (ir.host, ir.version, ir.community, ir.profile, config, indexes)
-            or frequency != interval
-        )
+    def clean_job_inventory(self, removed_entry_keys, inventory_hosts: set):
+        for entry_key in removed_entry_keys:
+            logger.debug("Removing job for %s", entry_key)
+            host, profile = entry_key.split("#", 1)
+            if profile == DYNAMIC_PROFILE:
+                self.delete_all_dynamic_entries_per_host(host)
+            elif entry_key in self._jobs_map:
+                job_scheduler.cancel_job(self._jobs_map.pop(entry_key))
+            db_host_id = return_database_id(entry_key)
+            if db_host_id not in inventory_hosts:
+                logger.info(
+                    "Removing _id %s from mongo database, it is not in used hosts %s",
+                    db_host_id,
+                    str(inventory_hosts),
+                )
+                self._mongo.delete_host(db_host_id)
+                self.delete_all_enricher_entries_per_host(db_host_id)
+                self._mongo.delete_onetime_walk_result(db_host_id)
 
     def process_jobs_for_enricher(self, enricher, ir):
         ifmib_structure = multi_key_lookup(
@@ -259,7 +265,9 @@ class Poller:
                 return
             logger.debug("Adding configuration for enricher job %s", entry_key)
             new_ir = update_inventory_record(ir, ifmib_oid, ttl)
-            job_reference = schedule.every(int(ttl)).seconds.do(
+            job_reference = job_scheduler.spread_every(
+                int(ttl),
+                entry_key,
                 snmp_polling,
                 new_ir.to_json(),
                 self._server_config,
@@ -278,67 +286,54 @@ class Poller:
             return
 
         logger.debug("Adding configuration for job %s", entry_key)
-        job_reference = schedule.every(int(ir.frequency_str)).seconds.do(
-            scheduled_task,
-            ir,
-            self._server_config,
-            self.__get_splunk_indexes(),
-            profiles,
+        job_reference = job_scheduler.spread_every(
+            int(ir.frequency_str), entry_key, self.__poll, ir
         )
         self._jobs_map[entry_key] = job_reference
 
-    def __update_schedule(self, ir, server_config, splunk_indexes, profiles):
-        entry_key = ir.host + "#" + ir.profile
-
+    def __update_schedule(self, entry_key, ir):
         logger.debug("Updating configuration for job %s", entry_key)
-        new_job_func = functools.partial(
-            scheduled_task,
-            ir,
-            server_config,
-            splunk_indexes,
-            profiles,
+        job_scheduler.update_job(
+            self._jobs_map.get(entry_key), int(ir.frequency_str), self.__poll, ir
         )
-        functools.update_wrapper(new_job_func, scheduled_task)
-
-        self._jobs_map.get(entry_key).job_func = new_job_func
-        self._jobs_map.get(entry_key).interval = int(ir.frequency_str)
-        old_next_run = self._jobs_map.get(entry_key).next_run
-        self._jobs_map.get(entry_key)._schedule_next_run()
-        new_next_run = self._jobs_map.get(entry_key).next_run
 
-        self._jobs_map.get(entry_key).next_run = (
-            old_next_run if new_next_run > old_next_run else new_next_run
+    def __poll(self, ir):
+        # the config is looked up when the job runs, so config changes don't have to touch every job
+        scheduled_task(
+            ir, self._server_config, self.__get_splunk_indexes(), self._profiles
         )
 
     def __start_realtime_scheduler_task(self):
-        # schedule.every().second.do(
-        # For debugging purposes better change it to "one second"
-        schedule.every(self._args.realtime_task_frequency).seconds.do(
+        # For debugging purposes better change the interval to one second
+        job_scheduler.every(
+            self._args.realtime_task_frequency,
             automatic_realtime_job,
             self._mongo,
-            self._args.inventory,
+            self.inventory_snapshot,
             self.__get_splunk_indexes(),
             self._server_config,
-            self._local_snmp_engine,
+            self._args.realtime_task_frequency,
             self.force_inventory_refresh,
             False,
         )
 
-        schedule.every(self._args.matching_task_frequency).seconds.do(
+        job_scheduler.every(
+            self._args.matching_task_frequency,
             self.process_unmatched_devices_job,
             self._args.config,
         )
 
         automatic_realtime_job(
             self._mongo,
-            self._args.inventory,
+            self.inventory_snapshot,
             self.__get_splunk_indexes(),
             self._server_config,
-            self._local_snmp_engine,
+            self._args.realtime_task_frequency,
             self.force_inventory_refresh,
             True,
         )
-        schedule.every(self._args.onetime_task_frequency).minutes.do(
+        job_scheduler.every(
+            self._args.onetime_task_frequency * 60,
             automatic_onetime_task,
             self._mongo,
             self.__get_splunk_indexes(),
@@ -386,6 +381,21 @@ class Poller:
                                     device.community,
                                     profile,
                                     frequency,
+                                    device.address,
+                                    get_transport_setting(
+                                        device.timeout,
+                                        profiles,
+                                        profile,
+                                        "timeout",
+                                        float,
+                                    ),
+                                    get_transport_setting(
+                                        device.retries,
+                                        profiles,
+                                        profile,
+                                        "retries",
+                                        int,
+                                    ),
                                 )
                                 self.process_new_job(entry_key, new_record, profiles)
                                 self._dynamic_jobs.add(entry_key)
@@ -400,4 +410,4 @@ class Poller:
 
 def scheduled_task(ir: InventoryRecord, server_config, splunk_indexes, profiles):
     logger.debug("Executing scheduled_task for %s", ir.__repr__())
-    snmp_polling.delay(ir.to_json(), server_config, splunk_indexes, profiles)
+    task_dispatcher.add(ir, server_config, splunk_indexes, profiles)
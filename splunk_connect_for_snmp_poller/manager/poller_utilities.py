@@ -15,26 +15,50 @@
 #
 import copy
 import csv
+import dataclasses
+import hashlib
+import io
 import logging.config
+import os
 import threading
+from collections import namedtuple
 
-import schedule
-from pysnmp.hlapi import ObjectIdentity, ObjectType, UdpTransportTarget, getCmd
+from pysnmp.hlapi import ObjectIdentity, ObjectType
 
-from splunk_connect_for_snmp_poller.manager.const import DEFAULT_POLLING_FREQUENCY
+from splunk_connect_for_snmp_poller.manager.async_poller import (
+    GET,
+    PollRequest,
+    close_async_engine,
+    poll_requests,
+)
+from splunk_connect_for_snmp_poller.manager.const import (
+    DEFAULT_ASYNC_MAX_IN_FLIGHT,
+    DEFAULT_POLLING_FREQUENCY,
+)
 from splunk_connect_for_snmp_poller.manager.data.inventory_record import InventoryRecord
+from splunk_connect_for_snmp_poller.manager.data.inventory_snapshot import (
+    InventorySnapshot,
+)
 from splunk_connect_for_snmp_poller.manager.realtime.oid_constant import OidConstant
 from splunk_connect_for_snmp_poller.manager.realtime.real_time_data import (
     should_redo_walk,
 )
+from splunk_connect_for_snmp_poller.manager.scheduler import job_scheduler
 from splunk_connect_for_snmp_poller.manager.static.interface_mib_utililities import (
     extract_network_interface_data_from_additional_config,
 )
-from splunk_connect_for_snmp_poller.manager.task_utilities import parse_port
+from splunk_connect_for_snmp_poller.manager.task_utilities import (
+    get_auth_and_context_data,
+    parse_port,
+)
 from splunk_connect_for_snmp_poller.manager.tasks import snmp_polling
 from splunk_connect_for_snmp_poller.manager.validator.inventory_validator import (
     DYNAMIC_PROFILE,
+    host_resolver,
+    is_empty,
     is_valid_inventory_line_from_dict,
+    is_valid_retries,
+    is_valid_timeout,
     should_process_inventory_line,
 )
 from splunk_connect_for_snmp_poller.manager.variables import (
@@ -60,6 +84,8 @@ def _should_process_current_line(inventory_record: dict):
         inventory_record.get("community"),
         inventory_record.get("profile"),
         inventory_record.get("frequency_str"),
+        inventory_record.get("timeout"),
+        inventory_record.get("retries"),
     )
 
 
@@ -78,7 +104,8 @@ def iterate_through_unwalked_hosts_scheduler(
             profile,
             "60",
         )
-        schedule.every().second.do(
+        job_scheduler.once(
+            1,
             onetime_task,
             inventory_record,
             server_config,
@@ -101,28 +128,115 @@ def onetime_task(
         None,
         one_time_flag=one_time_flag,
     )
-    logger.debug("Cancelling onetime_task for %s", inventory_record.__repr__())
-    return schedule.CancelJob
 
 
-def refresh_inventory(force_inventory_refresh):
-    force_inventory_refresh()
-    return schedule.CancelJob
+def load_inventory_snapshot(
+    inventory_file_path, profiles, previous: InventorySnapshot = None
+) -> InventorySnapshot:
+    """
+    Parses the inventory file into a snapshot. previous is returned as it is when neither the content of the file nor
+    the profiles have changed since it was built, so touching the file doesn't parse and validate it again.
+    """
+    with open(inventory_file_path, newline="") as inventory_file:
+        content = inventory_file.read()
+    version = hashlib.sha1(content.encode()).hexdigest()
+    if (
+        previous is not None
+        and previous.version == version
+        and previous.profiles is profiles
+    ):
+        logger.debug(f"Inventory {inventory_file_path} has not changed")
+        return previous
+    agents = list(csv.DictReader(io.StringIO(content, newline=""), delimiter=","))
+    records = {}
+    for ir in _inventory_records(agents, profiles):
+        entry_key = create_poller_scheduler_entry_key(ir.host, ir.profile)
+        if entry_key in records:
+            logger.error(
+                "%s has duplicated hostname %s and %s in the inventory, cannot use the same profile twice for "
+                "the same device",
+                ir.__repr__(),
+                ir.host,
+                ir.profile,
+            )
+            continue
+        records[entry_key] = ir
+    return InventorySnapshot(version, records, profiles)
+
+
+def refresh_inventory_addresses(snapshot: InventorySnapshot) -> InventorySnapshot:
+    """
+    Resolves again the hostnames of the snapshot whose addresses have expired in the resolver cache. Returns a new
+    snapshot when the address of any record has changed, otherwise snapshot itself. A hostname which can't be resolved
+    anymore keeps its last known address.
+    """
+    hostnames = {
+        ir.host: _inventory_hostname(ir.host) for ir in snapshot.records.values()
+    }
+    host_resolver.resolve_all(set(hostnames.values()))
+    records, changed = {}, False
+    for entry_key, ir in snapshot.records.items():
+        address = host_resolver.resolve(hostnames[ir.host])
+        if address is not None and address != ir.address:
+            logger.info(f"Address of {ir.host} has changed to {address}")
+            ir = dataclasses.replace(ir, address=address)
+            changed = True
+        records[entry_key] = ir
+    if not changed:
+        return snapshot
+    return InventorySnapshot(snapshot.version, records, snapshot.profiles)
+
+
+def _inventory_records(agents, profiles):
+    # resolve all the hosts at once, so validating the lines only hits the resolver cache
+    host_resolver.resolve_all(
+        _inventory_hostname(agent["host"])
+        for agent in agents
+        if agent.get("host") and should_process_inventory_line(agent["host"])
+    )
+    for agent in agents:
+        if _should_process_current_line(agent):
+            yield InventoryRecord(
+                agent["host"],
+                agent["version"],
+                agent["community"],
+                agent["profile"],
+                get_frequency(agent, profiles, DEFAULT_POLLING_FREQUENCY)
+                if agent["profile"] != DYNAMIC_PROFILE
+                else None,
+                host_resolver.resolve(_inventory_hostname(agent["host"])),
+                get_transport_setting(
+                    agent.get("timeout"), profiles, agent["profile"], "timeout", float
+                ),
+                get_transport_setting(
+                    agent.get("retries"), profiles, agent["profile"], "retries", int
+                ),
+            )
+
 
+def _inventory_hostname(host):
+    return parse_port(host.strip())[0].strip()
 
-def parse_inventory_file(inventory_file_path, profiles, fetch_frequency=True):
-    with open(inventory_file_path, newline="") as inventory_file:
-        for agent in csv.DictReader(inventory_file, delimiter=","):
-            if _should_process_current_line(agent):
-                yield InventoryRecord(
-                    agent["host"],
-                    agent["version"],
-                    agent["community"],
-                    agent["profile"],
-                    get_frequency(agent, profiles, DEFAULT_POLLING_FREQUENCY)
-                    if fetch_frequency and agent["profile"] != DYNAMIC_PROFILE
-                    else None,
-                )
+
+_transport_setting_validators = {
+    "timeout": is_valid_timeout,
+    "retries": is_valid_retries,
+}
+
+
+def get_transport_setting(value, profiles, profile, setting, convert):
+    """
+    Returns the SNMP timeout or retries of an inventory row: the value from its own column when it is set, otherwise
+    the one of its profile in config.yaml, otherwise None so the pysnmp default is used
+    """
+    if is_empty(value):
+        value = multi_key_lookup(profiles, ("profiles", profile, setting))
+    if value is None:
+        return None
+    if not _transport_setting_validators[setting](value):
+        logger.error(f"Invalid {setting}={value} for profile={profile}, ignoring it")
+        return None
+    return convert(value)
 
 
 def get_frequency(agent, profiles, default_frequency):
@@ -136,25 +250,46 @@ def get_frequency(agent, profiles, default_frequency):
     return default_frequency
 
 
-def _extract_sys_uptime_instance(
-    local_snmp_engine, host, version, community, server_config
-):
-    from splunk_connect_for_snmp_poller.manager.tasks import (
-        build_authData,
-        build_contextData,
+def _extract_sys_uptime_instances(inventory_records, server_config, deadline):
+    """
+    Queries sysUpTimeInstance of all the hosts concurrently. Hosts which didn't answer before the deadline are missing
+    from the result.
+    """
+    realtime_config = server_config.get("realtime") or {}
+    transport_settings = {
+        "timeout": realtime_config.get("timeout"),
+        "retries": realtime_config.get("retries"),
+    }
+    requests = {}
+    for db_host_id, inventory_record in inventory_records.items():
+        device_hostname, device_port = parse_port(db_host_id)
+        auth_data, context_data = get_auth_and_context_data(
+            inventory_record.version, inventory_record.community, server_config
+        )
+        requests[db_host_id] = PollRequest(
+            GET,
+            device_hostname,
+            device_port,
+            auth_data,
+            context_data,
+            [ObjectType(ObjectIdentity(OidConstant.SYS_UP_TIME_INSTANCE))],
+            inventory_record.address,
+            **transport_settings,
+        )
+    poll_requests(
+        list(requests.values()),
+        int(os.environ.get("ASYNC_MAX_IN_FLIGHT", DEFAULT_ASYNC_MAX_IN_FLIGHT)),
+        1,
+        deadline=deadline,
     )
+    return {
+        db_host_id: _sys_uptime_from_response(*request.responses[0])
+        for db_host_id, request in requests.items()
+        if request.responses
+    }
 
-    auth_data = build_authData(version, community, server_config)
-    context_data = build_contextData(version, community, server_config)
-    device_hostname, device_port = parse_port(host)
-    result = getCmd(
-        local_snmp_engine,
-        auth_data,
-        UdpTransportTarget((device_hostname, device_port)),
-        context_data,
-        ObjectType(ObjectIdentity(OidConstant.SYS_UP_TIME_INSTANCE)),
-    )
-    error_indication, error_status, error_index, var_binds = next(result)
+
+def _sys_uptime_from_response(error_indication, error_status, error_index, var_binds):
     sys_up_time_value = 0
     if not error_indication and not error_status:
         for a, b in var_binds:
@@ -169,31 +304,15 @@ def _extract_sys_uptime_instance(
     }
 
 
-def _walk_info(mongo_collection, host, current_sys_up_time):
-    host_already_walked = (
-        mongo_collection.first_time_walk_was_initiated(host, onetime_walk) != 0
-    )
+def _walk_info(real_time_state, host, current_sys_up_time):
+    host_already_walked, previous_sys_up_time = real_time_state.get(host, (False, None))
     logger.info(f"host_already_walked: {host_already_walked}")
     should_do_walk = not host_already_walked
     if host_already_walked:
-        previous_sys_up_time = mongo_collection.real_time_data_for(host)
         should_do_walk = should_redo_walk(previous_sys_up_time, current_sys_up_time)
     return host_already_walked, should_do_walk
 
 
-def _update_mongo(mongo_collection, host, host_already_walked, current_sys_up_time):
-    if not host_already_walked:
-        logger.info("Adding host: %s into Mongo database", host)
-        mongo_collection.add_host(host)
-
-    prev_content = mongo_collection.real_time_data_for(host)
-    if not prev_content:
-        prev_content = {}
-    prev_content.update(current_sys_up_time)
-
-    mongo_collection.update_real_time_data_for(host, prev_content)
-
-
 """
 This is the realtime task responsible for executing an SNMPWALK when
 * we discover an host for the first time, or
@@ -201,23 +320,30 @@ This is the realtime task responsible for executing an SNMPWALK when
 """
 
 
+_realtime_sweep_lock = threading.Lock()
+
+
 def automatic_realtime_job(
     mongo_collection,
-    inventory_file_path,
+    get_inventory_snapshot,
     splunk_indexes,
     server_config,
-    local_snmp_engine,
+    sweep_deadline,
     force_inventory_refresh,
     initial_walk,
 ):
+    # a sweep slower than realtime_task_frequency must not be overlapped by the next one
+    if not _realtime_sweep_lock.acquire(blocking=False):
+        logger.warning("Previous automatic_realtime_task is still running, skipping")
+        return
     job_thread = threading.Thread(
-        target=automatic_realtime_task,
+        target=_locked_automatic_realtime_task,
         args=[
             mongo_collection,
-            inventory_file_path,
+            get_inventory_snapshot,
             splunk_indexes,
             server_config,
-            local_snmp_engine,
+            sweep_deadline,
             force_inventory_refresh,
             initial_walk,
         ],
@@ -225,6 +351,14 @@ def automatic_realtime_job(
     job_thread.start()
 
 
+def _locked_automatic_realtime_task(*args):
+    try:
+        automatic_realtime_task(*args)
+    finally:
+        close_async_engine()
+        _realtime_sweep_lock.release()
+
+
 def automatic_onetime_task(
     mongo_collection,
     splunk_indexes,
@@ -243,50 +377,56 @@ def automatic_onetime_task(
 
 def automatic_realtime_task(
     mongo_collection,
-    inventory_file_path,
+    get_inventory_snapshot,
     splunk_indexes,
     server_config,
-    local_snmp_engine,
+    sweep_deadline,
     force_inventory_refresh,
     initial_walk,
 ):
     try:
-        for inventory_record in parse_inventory_file(
-            inventory_file_path, profiles=None, fetch_frequency=False
-        ):
-            db_host_id = return_database_id(inventory_record.host)
-            sys_up_time = _extract_sys_uptime_instance(
-                local_snmp_engine,
-                db_host_id,
-                inventory_record.version,
-                inventory_record.community,
-                server_config,
-            )
+        inventory_records = {}
+        for host, host_records in get_inventory_snapshot().by_host.items():
+            inventory_records.setdefault(return_database_id(host), host_records[0])
+        sys_up_times = _extract_sys_uptime_instances(
+            inventory_records, server_config, sweep_deadline
+        )
+        real_time_state = mongo_collection.real_time_state_for(
+            sys_up_times.keys(), onetime_walk
+        )
+        real_time_data, walked_hosts = {}, set()
+        for db_host_id, inventory_record in inventory_records.items():
+            sys_up_time = sys_up_times.get(db_host_id)
+            if sys_up_time is None:
+                logger.warning(
+                    f"No sysUpTimeInstance from {db_host_id} before the end of the sweep"
+                )
+                continue
             host_already_walked, should_do_walk = _walk_info(
-                mongo_collection, db_host_id, sys_up_time
+                real_time_state, db_host_id, sys_up_time
             )
             if should_do_walk:
                 logger.info("Scheduling WALK of full tree")
-                inventory_record.profile = OidConstant.UNIVERSAL_BASE_OID
-                schedule.every().second.do(
+                job_scheduler.once(
+                    1,
                     onetime_task,
-                    inventory_record,
+                    dataclasses.replace(
+                        inventory_record, profile=OidConstant.UNIVERSAL_BASE_OID
+                    ),
                     server_config,
                     splunk_indexes,
                 )
                 if not initial_walk:
                     # force inventory reloading after 2 min with new walk data
-                    schedule.every(2).minutes.do(
-                        refresh_inventory, force_inventory_refresh
-                    )
-            _update_mongo(
-                mongo_collection,
-                db_host_id,
-                host_already_walked,
-                sys_up_time,
-            )
-            if should_do_walk:
-                mongo_collection.update_walked_host(db_host_id, {onetime_walk: True})
+                    job_scheduler.once(120, force_inventory_refresh)
+                walked_hosts.add(db_host_id)
+            if db_host_id not in real_time_state:
+                logger.info("Adding host: %s into Mongo database", db_host_id)
+            # only sysUpTime is owned by the sweep, the rest of the real time data is merged in Mongo
+            real_time_data[db_host_id] = sys_up_time
+        mongo_collection.update_real_time_state(
+            real_time_data, walked_hosts, onetime_walk
+        )
     except Exception:
         logger.exception("Error during automatic_realtime_task")
 
@@ -320,7 +460,8 @@ def _update_enricher_config_with_ifmib(
     splunk_indexes,
 ):
     inventory_host.profile = OidConstant.IF_MIB
-    schedule.every().second.do(
+    job_scheduler.once(
+        1,
         onetime_task,
         inventory_host,
         server_config,
@@ -376,6 +517,24 @@ def modified_oid_families(server_config):
     return additional_enricher_varbinds
 
 
+InventoryDiff = namedtuple("InventoryDiff", "added, removed, changed")
+
+
+def diff_inventory(old_inventory: dict, new_inventory: dict) -> InventoryDiff:
+    """
+    Compares two inventories given as dictionaries entry key -> InventoryRecord
+    @return: sets of entry keys which were added, removed, or whose record has changed
+    """
+    added = new_inventory.keys() - old_inventory.keys()
+    removed = old_inventory.keys() - new_inventory.keys()
+    changed = {
+        entry_key
+        for entry_key, ir in new_inventory.items()
+        if entry_key in old_inventory and old_inventory[entry_key] != ir
+    }
+    return InventoryDiff(added=added, removed=removed, changed=changed)
+
+
 def create_poller_scheduler_entry_key(host, profile):
     return host + "#" + profile
 
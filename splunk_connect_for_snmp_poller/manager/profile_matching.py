@@ -13,6 +13,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import hashlib
+import json
 import logging.config
 import re
 
@@ -21,6 +23,7 @@ import yaml
 from splunk_connect_for_snmp_poller.manager.const import DEFAULT_POLLING_FREQUENCY
 from splunk_connect_for_snmp_poller.manager.mib_server_client import get_mib_profiles
 from splunk_connect_for_snmp_poller.manager.realtime.oid_constant import OidConstant
+from splunk_connect_for_snmp_poller.manager.variables import profile_varbinds_hash
 from splunk_connect_for_snmp_poller.utilities import multi_key_lookup
 
 logger = logging.getLogger(__name__)
@@ -70,5 +73,19 @@ def get_profiles(server_config):
     if "profiles" in server_config:
         merged_profiles.update(server_config["profiles"])
 
-    result["profiles"] = merged_profiles
+    # the profiles are copied, so the hashes don't end up in server_config
+    result["profiles"] = {
+        name: {**profile, profile_varbinds_hash: varbinds_hash(profile)}
+        if isinstance(profile, dict)
+        else profile
+        for name, profile in merged_profiles.items()
+    }
     return result
+
+
+def varbinds_hash(profile):
+    """
+    Content hash of profile varBinds, workers use it as a key of already compiled varbinds
+    """
+    varbinds = json.dumps(profile.get("varBinds"), sort_keys=True, default=str)
+    return hashlib.sha1(varbinds.encode()).hexdigest()
@@ -0,0 +1,221 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import functools
+import hashlib
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+
+from splunk_connect_for_snmp_poller.manager.const import DEFAULT_SCHEDULE_JITTER
+
+logger = logging.getLogger(__name__)
+
+
+class CancelJob:
+    """
+    Can be returned by a periodic job function to remove the job from the scheduler
+    """
+
+
+class Job:
+    def __init__(self, interval, job_func, one_shot):
+        self.interval = interval
+        self.job_func = job_func
+        self.one_shot = one_shot
+        self.next_run = None
+        # set for jobs spread across their interval, see Scheduler.spread_every()
+        self.spread_key = None
+        self.cancelled = False
+        # bumped on every reschedule, so heap entries of older deadlines are skipped
+        self.version = 0
+
+    def __repr__(self):
+        return f"Job(interval={self.interval}, job_func={self.job_func}, next_run={self.next_run})"
+
+
+class Scheduler:
+    """
+    Runs periodic and one-shot jobs. Jobs are kept in a heap ordered by their next run, so adding, cancelling and
+    rescheduling a job is O(log n) and only due jobs are looked at, no matter how many jobs are scheduled. Cancelled
+    and rescheduled jobs leave their old heap entries behind, those are dropped when they reach the top.
+    All methods are thread-safe and run_forever() sleeps until the next deadline or until an earlier job is added.
+    """
+
+    def __init__(self, clock=time.monotonic, jitter=0):
+        self._clock = clock
+        self._jitter = jitter
+        self._heap = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+
+    def every(self, interval, job_func, *args, **kwargs) -> Job:
+        """
+        Schedules job_func to be run every interval seconds, the first time after interval seconds
+        """
+        job = Job(interval, self._partial(job_func, *args, **kwargs), False)
+        with self._condition:
+            self._push(job, self._clock() + interval)
+        return job
+
+    def spread_every(self, interval, spread_key, job_func, *args, **kwargs) -> Job:
+        """
+        Schedules job_func to be run every interval seconds at a fixed phase within the interval, derived from
+        spread_key, so jobs with the same interval don't all fire at the same moment. Every run is additionally
+        delayed by a random jitter of at most the scheduler's jitter (capped at half of the interval).
+        """
+        job = Job(interval, self._partial(job_func, *args, **kwargs), False)
+        job.spread_key = spread_key
+        with self._condition:
+            self._push(job, self._next_slot(job, self._clock()))
+        return job
+
+    def once(self, delay, job_func, *args, **kwargs) -> Job:
+        """
+        Schedules job_func to be run a single time after delay seconds
+        """
+        job = Job(delay, self._partial(job_func, *args, **kwargs), True)
+        with self._condition:
+            self._push(job, self._clock() + delay)
+        return job
+
+    def update_job(self, job, interval, job_func, *args, **kwargs):
+        """
+        Replaces the function and interval of a periodic job. The job keeps its next run unless the new interval
+        brings it closer.
+        """
+        with self._condition:
+            job.job_func = self._partial(job_func, *args, **kwargs)
+            job.interval = interval
+            if not job.cancelled:
+                if job.spread_key is not None:
+                    next_slot = self._next_slot(job, self._clock())
+                else:
+                    next_slot = self._clock() + interval
+                next_run = min(job.next_run, next_slot)
+                if next_run != job.next_run:
+                    self._push(job, next_run)
+
+    def cancel_job(self, job):
+        with self._condition:
+            job.cancelled = True
+
+    def idle_seconds(self):
+        """
+        Returns the number of seconds until the next job is due, or None when there are no jobs
+        """
+        with self._condition:
+            self._drop_stale()
+            if not self._heap:
+                return None
+            return max(0.0, self._heap[0][0] - self._clock())
+
+    def run_pending(self):
+        for job in self._pop_due():
+            self._run_job(job)
+
+    def run_forever(self, after_run_pending=None):
+        """
+        Runs the due jobs as they come. after_run_pending, if given, is called after every batch of due jobs.
+        """
+        while True:
+            with self._condition:
+                timeout = self.idle_seconds()
+                if timeout is None or timeout > 0:
+                    self._condition.wait(timeout)
+            self.run_pending()
+            if after_run_pending is not None:
+                try:
+                    after_run_pending()
+                except Exception:
+                    logger.exception(f"Error while running {after_run_pending}")
+
+    @staticmethod
+    def _partial(job_func, *args, **kwargs):
+        partial = functools.partial(job_func, *args, **kwargs)
+        functools.update_wrapper(partial, job_func)
+        return partial
+
+    @staticmethod
+    def phase(spread_key, interval):
+        """
+        Returns the offset within the interval at which the job identified by spread_key runs. It only depends on
+        spread_key and the interval, so reconfiguring a job without changing its interval keeps it in its slot.
+        """
+        digest = int(hashlib.sha1(spread_key.encode()).hexdigest(), 16)
+        return digest % int(interval * 1000) / 1000
+
+    def _next_slot(self, job, now):
+        phase = self.phase(job.spread_key, job.interval)
+        slot = now - (now - phase) % job.interval + job.interval
+        if self._jitter:
+            slot += random.uniform(0, min(self._jitter, job.interval / 2))
+        return slot
+
+    def _push(self, job, next_run):
+        job.version += 1
+        job.next_run = next_run
+        heapq.heappush(self._heap, (next_run, next(self._counter), job.version, job))
+        if self._heap[0][3] is job:
+            self._condition.notify()
+
+    def _is_stale(self, entry):
+        _, _, version, job = entry
+        return job.cancelled or version != job.version
+
+    def _drop_stale(self):
+        while self._heap and self._is_stale(self._heap[0]):
+            heapq.heappop(self._heap)
+
+    def _pop_due(self):
+        due = []
+        with self._condition:
+            now = self._clock()
+            while self._heap and self._heap[0][0] <= now:
+                entry = heapq.heappop(self._heap)
+                if not self._is_stale(entry):
+                    due.append(entry[3])
+        return due
+
+    def _run_job(self, job):
+        try:
+            result = job.job_func()
+        except Exception:
+            logger.exception(f"Error while running {job}")
+            result = None
+        with self._condition:
+            if job.cancelled:
+                return
+            if job.one_shot or result is CancelJob:
+                job.cancelled = True
+                return
+            now = self._clock()
+            if job.spread_key is not None:
+                next_run = self._next_slot(job, now)
+            else:
+                # keep the job on its period, unless it is so late that whole periods were missed
+                next_run = job.next_run + job.interval
+                if next_run <= now:
+                    next_run = now + job.interval
+            self._push(job, next_run)
+
+
+job_scheduler = Scheduler(
+    jitter=float(os.environ.get("SCHEDULE_JITTER", DEFAULT_SCHEDULE_JITTER))
+)
@@ -16,8 +16,11 @@
 import json
 import os
 import re
-from collections import namedtuple
+import threading
+import time
+from collections import OrderedDict, namedtuple
 from typing import Tuple
+from urllib.parse import urlparse
 
 from celery.utils.log import get_task_logger
 from pysnmp.hlapi import (
@@ -29,11 +32,16 @@ from pysnmp.hlapi import (
     getCmd,
     nextCmd,
 )
-from pysnmp.proto import rfc1902
+from pysnmp.proto import errind, rfc1902
 from pysnmp.smi import builder, compiler, view
 from pysnmp.smi.rfc1902 import ObjectIdentity, ObjectType
 
 from splunk_connect_for_snmp_poller.manager.const import (
+    BULK_MAX_REPETITIONS_LOWER_LIMIT,
+    BULK_MAX_REPETITIONS_UPPER_LIMIT,
+    DEFAULT_BULK_MAX_REPETITIONS,
+    DEFAULT_MIB_VIEW_CHECK_INTERVAL,
+    DEFAULT_WALK_MAX_REPETITIONS,
     AuthProtocolMap,
     PrivProtocolMap,
 )
@@ -62,6 +70,10 @@ class VarbindCollection(namedtuple("VarbindCollection", "get, bulk")):
 # to compare the performance between the runDispatcher() and the current getCmd()/nextCmd() .
 
 oids_to_store = {OidConstant.SYS_DESCR, OidConstant.SYS_OBJECT_ID}
+# the same OIDs as tuples, so the rows of a walk are checked without turning their OIDs into strings
+_oid_tuples_to_store = {
+    tuple(int(arc) for arc in oid.split(".")) for oid in oids_to_store
+}
 
 
 def is_metric_data(value):
@@ -204,18 +216,120 @@ def mib_string_handler(mib_list: list) -> VarbindCollection:
     return VarbindCollection(get=get_list, bulk=bulk_list)
 
 
+class MibViewCache:
+    """
+    Building a MibViewController and attaching a MIB compiler to it is expensive, so the view is built once per
+    process and every (mib, symbol[, index]) resolution is remembered. Both are dropped when the MIB files location
+    changes, or when the MIB files of a local location change, which is checked at most every check_interval
+    seconds. Changes of MIB files on a remote location can't be detected, the workers have to be restarted then.
+    """
+
+    def __init__(
+        self, check_interval=DEFAULT_MIB_VIEW_CHECK_INTERVAL, clock=time.monotonic
+    ):
+        self._lock = threading.Lock()
+        self._check_interval = check_interval
+        self._clock = clock
+        self._mib_sources = None
+        self._source_version = None
+        self._next_check = 0
+        self._generation = 0
+        self._mib_view_controller = None
+        self._resolved_oids = {}
+
+    def resolve(self, mib_string, mib_sources):
+        key = tuple(mib_string)
+        with self._lock:
+            self._check_sources(mib_sources)
+            if self._mib_view_controller is None:
+                self._build(mib_sources)
+            oid = self._resolved_oids.get(key)
+            if oid is None:
+                oid = ObjectIdentity(*mib_string).resolveWithMib(
+                    self._mib_view_controller
+                )
+                self._resolved_oids[key] = oid
+            return oid
+
+    def generation(self, mib_sources):
+        """
+        Returns a number which changes every time the MIB view is dropped, results derived from the resolved OIDs
+        can be cached together with it
+        """
+        with self._lock:
+            self._check_sources(mib_sources)
+            return self._generation
+
+    def clear(self):
+        with self._lock:
+            self._drop()
+
+    def _check_sources(self, mib_sources):
+        if mib_sources != self._mib_sources:
+            self._drop()
+            self._mib_sources = mib_sources
+            self._source_version = mib_source_version(mib_sources)
+            self._next_check = self._clock() + self._check_interval
+        elif self._clock() >= self._next_check:
+            self._next_check = self._clock() + self._check_interval
+            source_version = mib_source_version(mib_sources)
+            if source_version != self._source_version:
+                logger.info(f"MIB files in {mib_sources} have changed")
+                self._drop()
+                self._source_version = source_version
+
+    def _drop(self):
+        self._mib_view_controller = None
+        self._resolved_oids = {}
+        self._generation += 1
+
+    def _build(self, mib_sources):
+        logger.debug(f"Building MIB view for {mib_sources}")
+        mibBuilder = builder.MibBuilder()
+        self._mib_view_controller = view.MibViewController(mibBuilder)
+        config = {"sources": [mib_sources]}
+        compiler.addMibCompiler(mibBuilder, **config)
+
+
+def mib_source_version(mib_sources):
+    """
+    Returns the newest modification time of a local MIB files location (a directory or a file:// URL, optionally
+    ending with an @mib@ file pattern), or None when it is a remote location or can't be read
+    """
+    if not mib_sources:
+        return None
+    parsed = urlparse(mib_sources)
+    if parsed.scheme == "file":
+        path = parsed.path
+    elif not parsed.scheme:
+        path = mib_sources
+    else:
+        return None
+    directory = path.split("@mib@")[0]
+    if not os.path.isdir(directory):
+        directory = os.path.dirname(directory)
+    try:
+        with os.scandir(directory) as entries:
+            return max(
+                [os.stat(directory).st_mtime]
+                + [entry.stat().st_mtime for entry in entries if entry.is_file()]
+            )
+    except OSError:
+        return None
+
+
+mib_view_cache = MibViewCache(
+    float(os.environ.get("MIB_VIEW_CHECK_INTERVAL", DEFAULT_MIB_VIEW_CHECK_INTERVAL))
+)
+
+
 def translate_list_to_oid(mib_string):
-    mibBuilder = builder.MibBuilder()
-    mibViewController = view.MibViewController(mibBuilder)
-    config = {"sources": [os.environ["MIBS_FILES_URL"]]}
-    compiler.addMibCompiler(mibBuilder, **config)
-    oid = ObjectIdentity(*mib_string).resolveWithMib(mibViewController)
-    return oid
+    return mib_view_cache.resolve(mib_string, os.environ["MIBS_FILES_URL"])
 
 
 def snmp_get_handler(
     mongo_connection,
-    enricher_presence,
+    enrichment,
     snmp_engine,
     hec_sender,
     auth_data,
@@ -234,50 +348,149 @@ def snmp_get_handler(
     e.g. 1.3.6.1.2.1.1.9.1.2.1,
     which queries the info correlated to this specific oid
     """
-    errorIndication, errorStatus, errorIndex, varBinds = next(
+    response = next(
         getCmd(
             snmp_engine,
             auth_data,
-            UdpTransportTarget((host, port)),
+            udp_transport_target(ir, host, port),
             context_data,
             *var_binds,
         )
     )
+    process_get_response(
+        response,
+        enrichment,
+        hec_sender,
+        host,
+        mib_server_url,
+        index,
+        one_time_flag,
+        ir,
+        additional_metric_fields,
+    )
+
+
+def process_get_response(
+    response,
+    enrichment,
+    hec_sender,
+    host,
+    mib_server_url,
+    index,
+    one_time_flag,
+    ir,
+    additional_metric_fields,
+):
+    """
+    Translates and sends to HEC the result of one SNMP GET, no matter if it was sent with the synchronous or the
+    asyncio engine
+    """
+    errorIndication, errorStatus, errorIndex, varBinds = response
     if not _any_failure_happened(errorIndication, errorStatus, errorIndex, varBinds):
-        mib_enricher, return_multimetric = _enrich_response(
-            mongo_connection, enricher_presence, f"{host}:{port}"
+        _send_translated_varbinds(
+            varBinds,
+            enrichment,
+            hec_sender,
+            host,
+            mib_server_url,
+            index,
+            one_time_flag,
+            ir,
+            additional_metric_fields,
         )
-        for varbind in varBinds:
-            result, is_metric = get_translated_string(
-                mib_server_url, [varbind], return_multimetric
-            )
-            post_data_to_splunk_hec(
-                hec_sender,
-                host,
-                result,
-                is_metric,
-                index,
-                ir,
-                additional_metric_fields,
-                one_time_flag=OnetimeFlag.is_a_walk(one_time_flag),
-                mib_enricher=mib_enricher,
-            )
     else:
-        is_error, result = prepare_error_message(
-            errorIndication, errorStatus, errorIndex, varBinds
+        _send_error_message(
+            errorIndication,
+            errorStatus,
+            errorIndex,
+            varBinds,
+            hec_sender,
+            host,
+            index,
+            one_time_flag,
+            ir,
+            additional_metric_fields,
         )
-        if is_error:
-            post_data_to_splunk_hec(
-                hec_sender,
-                host,
-                result,
-                False,  # fail during bulk so sending to event index
-                index,
-                ir,
-                additional_metric_fields,
-                one_time_flag=OnetimeFlag.is_a_walk(one_time_flag),
-                is_error=is_error,
+
+
+def _send_translated_varbinds(
+    var_binds,
+    enrichment,
+    hec_sender,
+    host,
+    mib_server_url,
+    index,
+    one_time_flag,
+    ir,
+    additional_metric_fields,
+):
+    if not var_binds:
+        return
+    mib_enricher, return_multimetric = enrichment.get()
+    for var_bind in var_binds:
+        result, is_metric = get_translated_string(
+            mib_server_url, [var_bind], return_multimetric
+        )
+        post_data_to_splunk_hec(
+            hec_sender,
+            host,
+            result,
+            is_metric,
+            index,
+            ir,
+            additional_metric_fields,
+            one_time_flag=OnetimeFlag.is_a_walk(one_time_flag),
+            mib_enricher=mib_enricher,
+        )
+
+
+def _send_error_message(
+    error_indication,
+    error_status,
+    error_index,
+    var_binds,
+    hec_sender,
+    host,
+    index,
+    one_time_flag,
+    ir,
+    additional_metric_fields,
+):
+    is_error, result = prepare_error_message(
+        error_indication, error_status, error_index, var_binds
+    )
+    if is_error:
+        post_data_to_splunk_hec(
+            hec_sender,
+            host,
+            result,
+            False,  # fail during get/bulk so sending to event index
+            index,
+            ir,
+            additional_metric_fields,
+            one_time_flag=OnetimeFlag.is_a_walk(one_time_flag),
+            is_error=is_error,
+        )
+
+
+class EnrichmentSnapshot:
+    """
+    Static MIB data used for enrichment doesn't change during a task, so it is read from Mongo at most once per task
+    and shared by the GET handler and every page of the BULK handler.
+    """
+
+    def __init__(self, mongo_connection, enricher_presence, hostname):
+        self._mongo_connection = mongo_connection
+        self._enricher_presence = enricher_presence
+        self._hostname = hostname
+        self._enrichment = None
+
+    def get(self):
+        if self._enrichment is None:
+            self._enrichment = _enrich_response(
+                self._mongo_connection, self._enricher_presence, self._hostname
             )
+        return self._enrichment
 
 
 def _enrich_response(mongo_connection, enricher_presence, hostname):
@@ -371,7 +584,7 @@ def prepare_error_message(
 
 def snmp_bulk_handler(
     mongo_connection,
-    enricher_presence,
+    enrichment,
     snmp_engine,
     hec_sender,
     auth_data,
@@ -388,56 +601,142 @@ def snmp_bulk_handler(
     """
     Perform the SNMP Bulk for an array of oids
     """
+    host_id = f"{host}:{port}"
+    max_repetitions = mongo_connection.max_repetitions_for([host_id]).get(
+        host_id, DEFAULT_BULK_MAX_REPETITIONS
+    )
+    observation = BulkObservation()
     g = bulkCmd(
         snmp_engine,
         auth_data,
-        UdpTransportTarget((host, port)),
+        udp_transport_target(ir, host, port),
         context_data,
         0,
-        50,
+        max_repetitions,
         *var_binds,
         lexicographicMode=False,
     )
-    for (errorIndication, errorStatus, errorIndex, var_binds) in g:
+    process_bulk_responses(
+        observation.observe(g),
+        enrichment,
+        hec_sender,
+        host,
+        mib_server_url,
+        index,
+        one_time_flag,
+        ir,
+        additional_metric_fields,
+    )
+    update_learned_max_repetitions(
+        mongo_connection, [(host_id, max_repetitions, observation)]
+    )
+
+
+class BulkObservation:
+    """
+    Follows the responses of a BULK request on their way to process_bulk_responses() and records what the device
+    returned: the number of rows and the error which ended the request, if any
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.error_indication = None
+        self.error_status = None
+
+    def observe(self, responses):
+        for response in responses:
+            error_indication, error_status, _, _ = response
+            if error_indication or error_status:
+                self.error_indication = error_indication
+                self.error_status = error_status
+            else:
+                self.rows += 1
+            yield response
+
+
+def adapt_max_repetitions(max_repetitions, observation: BulkObservation):
+    """
+    Returns the max-repetitions for the next BULK request to the same device. It is halved when the device timed out
+    or answered tooBig, and grown by a quarter when the device answered without errors but one PDU was not enough.
+    """
+    too_big = observation.error_status and int(observation.error_status) == 1
+    if too_big or isinstance(observation.error_indication, errind.RequestTimedOut):
+        return max(BULK_MAX_REPETITIONS_LOWER_LIMIT, max_repetitions // 2)
+    if (
+        not observation.error_indication
+        and not observation.error_status
+        and observation.rows > max_repetitions
+    ):
+        return min(
+            BULK_MAX_REPETITIONS_UPPER_LIMIT,
+            max_repetitions + max(1, max_repetitions // 4),
+        )
+    return max_repetitions
+
+
+def update_learned_max_repetitions(mongo_connection, observations):
+    """
+    Stores the adapted max-repetitions of the hosts whose value changed. observations is a list of
+    (host id, max-repetitions used, BulkObservation), a host polled more than once keeps the lowest adapted value.
+    """
+    used, adapted = {}, {}
+    for host_id, max_repetitions, observation in observations:
+        value = adapt_max_repetitions(max_repetitions, observation)
+        used[host_id] = max_repetitions
+        adapted[host_id] = min(value, adapted.get(host_id, value))
+    changed = {
+        host_id: value for host_id, value in adapted.items() if value != used[host_id]
+    }
+    if changed:
+        logger.info(f"Adapting BULK max-repetitions: {changed}")
+        mongo_connection.update_max_repetitions(changed)
+
+
+def process_bulk_responses(
+    responses,
+    enrichment,
+    hec_sender,
+    host,
+    mib_server_url,
+    index,
+    one_time_flag,
+    ir,
+    additional_metric_fields,
+):
+    """
+    Translates and sends to HEC the rows returned by SNMP BULK, no matter if they come from the synchronous bulkCmd
+    generator or the asyncio engine.
+    """
+    for (errorIndication, errorStatus, errorIndex, var_binds) in responses:
         if not _any_failure_happened(
             errorIndication, errorStatus, errorIndex, var_binds
         ):
-            mib_enricher, return_multimetric = _enrich_response(
-                mongo_connection, enricher_presence, f"{host}:{port}"
-            )
             # Bulk operation returns array of var_binds
-            for varbind in var_binds:
-                logger.debug(f"Bulk returned this varbind: {var_binds}")
-                result, is_metric = get_translated_string(
-                    mib_server_url, [varbind], return_multimetric
-                )
-                post_data_to_splunk_hec(
-                    hec_sender,
-                    host,
-                    result,
-                    is_metric,
-                    index,
-                    ir,
-                    additional_metric_fields,
-                    one_time_flag=OnetimeFlag.is_a_walk(one_time_flag),
-                    mib_enricher=mib_enricher,
-                )
+            logger.debug(f"Bulk returned this varbinds: {var_binds}")
+            _send_translated_varbinds(
+                var_binds,
+                enrichment,
+                hec_sender,
+                host,
+                mib_server_url,
+                index,
+                one_time_flag,
+                ir,
+                additional_metric_fields,
+            )
         else:
-            is_error, result = prepare_error_message(
-                errorIndication, errorStatus, errorIndex, var_binds
+            _send_error_message(
+                errorIndication,
+                errorStatus,
+                errorIndex,
+                var_binds,
+                hec_sender,
+                host,
+                index,
+                one_time_flag,
+                ir,
+                additional_metric_fields,
             )
-            if is_error:
-                post_data_to_splunk_hec(
-                    hec_sender,
-                    host,
-                    result,
-                    False,  # fail during bulk so sending to event index
-                    index,
-                    ir,
-                    additional_metric_fields,
-                    one_time_flag=OnetimeFlag.is_a_walk(one_time_flag),
-                    is_error=is_error,
-                )
             break
 
 
@@ -455,6 +754,7 @@ def walk_handler(
     one_time_flag,
     ir,
     additional_metric_fields,
+    max_repetitions=DEFAULT_WALK_MAX_REPETITIONS,
 ):
     """
     Perform the SNMP Walk for oid end with *,
@@ -462,46 +762,51 @@ def walk_handler(
     which queries the infos correlated to all the oids that underneath the prefix before the *, e.g. 1.3.6.1.2.1.1.9
     """
     error_in_one_time_walk = False
-    for (errorIndication, errorStatus, errorIndex, var_binds) in nextCmd(
-        snmp_engine,
-        auth_data,
-        UdpTransportTarget((host, port)),
-        context_data,
-        ObjectType(ObjectIdentity(profile[:-2])),
-        lexicographicMode=False,
-    ):
-        is_metric = False
-        extract_data_to_mongo(host, port, mongo_connection, var_binds)
-        if _any_walk_failure_happened(
-            hec_sender,
-            errorIndication,
-            errorStatus,
-            errorIndex,
-            host,
-            index,
-            OnetimeFlag.is_a_walk(one_time_flag),
-            is_metric,
-            ir,
-            additional_metric_fields,
-            var_binds,
+    real_time_data = {}
+    try:
+        for (errorIndication, errorStatus, errorIndex, var_binds) in walk_cmd(
+            snmp_engine,
+            auth_data,
+            udp_transport_target(ir, host, port),
+            context_data,
+            ir.version,
+            profile[:-2],
+            max_repetitions,
         ):
-            if OnetimeFlag.is_a_walk(one_time_flag):
-                error_in_one_time_walk = True
-            break
-        else:
-            result, is_metric = get_translated_string(
-                mib_server_url, var_binds, force_event=True
-            )
-            post_data_to_splunk_hec(
+            is_metric = False
+            collect_real_time_data(real_time_data, var_binds)
+            if _any_walk_failure_happened(
                 hec_sender,
+                errorIndication,
+                errorStatus,
+                errorIndex,
                 host,
-                result,
-                False,
                 index,
+                OnetimeFlag.is_a_walk(one_time_flag),
+                is_metric,
                 ir,
                 additional_metric_fields,
-                one_time_flag=OnetimeFlag.is_a_walk(one_time_flag),
-            )
+                var_binds,
+            ):
+                if OnetimeFlag.is_a_walk(one_time_flag):
+                    error_in_one_time_walk = True
+                break
+            else:
+                result, is_metric = get_translated_string(
+                    mib_server_url, var_binds, force_event=True
+                )
+                post_data_to_splunk_hec(
+                    hec_sender,
+                    host,
+                    result,
+                    False,
+                    index,
+                    ir,
+                    additional_metric_fields,
+                    one_time_flag=OnetimeFlag.is_a_walk(one_time_flag),
+                )
+    finally:
+        store_real_time_data(f"{host}:{port}", mongo_connection, real_time_data)
     if OnetimeFlag.is_a_walk(one_time_flag):
         process_one_time_flag(
             one_time_flag,
@@ -513,21 +818,96 @@ def walk_handler(
     logger.info(f"Walk finished for {host} profile={profile}")
 
 
-def extract_data_to_mongo(host, port, mongo_connection, var_binds):
-    oid = str(var_binds[0][0].getOid())
-    val = str(var_binds[0][1])
-    if oid in oids_to_store:
-        host_id = "{host}:{port}".format(host=host, port=port)
+def transport_options(timeout, retries) -> dict:
+    """
+    Returns the timeout and retries keyword arguments of UdpTransportTarget, leaving out the ones which are not set
+    """
+    options = {}
+    if timeout is not None:
+        options["timeout"] = timeout
+    if retries is not None:
+        options["retries"] = retries
+    return options
 
-        prev_content = mongo_connection.real_time_data_for(host_id)
-        if not prev_content:
-            prev_content = {}
-        prev_content[oid] = {
-            "value": val,
+
+def udp_transport_target(ir, host, port):
+    return UdpTransportTarget(
+        (ir.address or host, port), **transport_options(ir.timeout, ir.retries)
+    )
+
+
+def walk_cmd(
+    snmp_engine,
+    auth_data,
+    transport_target,
+    context_data,
+    version,
+    oid,
+    max_repetitions,
+):
+    """
+    Walks the subtree under oid and yields its rows in the same format as nextCmd. Rows are fetched with GETBULK,
+    max_repetitions of them per request, except for SNMPv1 agents which don't support it and are walked with GETNEXT.
+    """
+    var_bind = ObjectType(ObjectIdentity(oid))
+    if version == "1":
+        return nextCmd(
+            snmp_engine,
+            auth_data,
+            transport_target,
+            context_data,
+            var_bind,
+            lexicographicMode=False,
+        )
+    return bulkCmd(
+        snmp_engine,
+        auth_data,
+        transport_target,
+        context_data,
+        0,
+        max_repetitions,
+        var_bind,
+        lexicographicMode=False,
+    )
+
+
+def get_walk_max_repetitions(server_config, host_id):
+    """
+    Returns the max-repetitions of the walks of a device: walk.devices.<host:port>.maxRepetitions from config.yaml,
+    otherwise walk.maxRepetitions, otherwise DEFAULT_WALK_MAX_REPETITIONS
+    """
+    walk_config = server_config.get("walk") or {}
+    device_config = (walk_config.get("devices") or {}).get(host_id) or {}
+    return int(
+        device_config.get(
+            "maxRepetitions",
+            walk_config.get("maxRepetitions", DEFAULT_WALK_MAX_REPETITIONS),
+        )
+    )
+
+
+def collect_real_time_data(real_time_data, var_binds):
+    """
+    Keeps the value of a walked row in real_time_data when its OID is one of oids_to_store
+    """
+    if var_binds and var_binds[0][0].getOid().asTuple() in _oid_tuples_to_store:
+        real_time_data[str(var_binds[0][0].getOid())] = {
+            "value": str(var_binds[0][1]),
             "type": "str",
         }
 
-        mongo_connection.update_real_time_data_for(host_id, prev_content)
+
+def store_real_time_data(host_id, mongo_connection, real_time_data):
+    """
+    Merges the real time data collected during a walk into the one stored for the host, with one read and one write
+    """
+    if not real_time_data:
+        return
+    prev_content = mongo_connection.real_time_data_for(host_id)
+    if not prev_content:
+        prev_content = {}
+    prev_content.update(real_time_data)
+    mongo_connection.update_real_time_data_for(host_id, prev_content)
 
 
 def process_one_time_flag(
@@ -557,6 +937,7 @@ def walk_handler_with_enricher(
     one_time_flag,
     ir,
     additional_metric_fields,
+    max_repetitions=DEFAULT_WALK_MAX_REPETITIONS,
 ):
     """
     Perform the SNMP Walk for oid end with *,
@@ -566,13 +947,14 @@ def walk_handler_with_enricher(
     merged_result = []
     merged_result_metric = []
     merged_result_non_metric = []
-    for (errorIndication, errorStatus, errorIndex, var_binds) in nextCmd(
+    for (errorIndication, errorStatus, errorIndex, var_binds) in walk_cmd(
         snmp_engine,
         auth_data,
-        UdpTransportTarget((host, port)),
+        udp_transport_target(ir, host, port),
         context_data,
-        ObjectType(ObjectIdentity(profile[:-2])),
-        lexicographicMode=False,
+        ir.version,
+        profile[:-2],
+        max_repetitions,
     ):
         is_metric = False
         if _any_walk_failure_happened(
@@ -861,6 +1243,57 @@ def build_contextData(version, community, server_config):
         logger.error(f"Error happend while building ContextData: {e}")
 
 
+class SnmpAuthCache:
+    """
+    Keeps the authData/contextData built for a (version, community or userName) pair, so every poll of a device
+    reuses the same objects and the SnmpEngine finds them already configured. Entries are keyed by the content of
+    the community/user entry of config.yaml, so changing credentials builds new objects.
+    """
+
+    MAX_ENTRIES = 4096
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, version, community, server_config):
+        section = "usernames" if version == "3" else "communities"
+        credentials = (server_config.get(section) or {}).get(community)
+        key = (
+            version,
+            community,
+            json.dumps(credentials, sort_keys=True, default=str),
+        )
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+        entry = (
+            build_authData(version, community, server_config),
+            build_contextData(version, community, server_config),
+        )
+        if None in entry:
+            # building failed and was logged, don't remember it
+            return entry
+        with self._lock:
+            self._entries[key] = entry
+            while len(self._entries) > SnmpAuthCache.MAX_ENTRIES:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries = OrderedDict()
+
+
+snmp_auth_cache = SnmpAuthCache()
+
+
+def get_auth_and_context_data(version, community, server_config):
+    return snmp_auth_cache.get(version, community, server_config)
+
+
 def is_oid(profile: str) -> bool:
     """
     This function checks if profile is an OID. OID is defined as a string of format:
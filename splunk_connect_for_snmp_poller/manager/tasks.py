@@ -14,29 +14,71 @@
 # limitations under the License.
 #
 import os
+import threading
+from collections import OrderedDict
 
 from celery import Task
+from celery.signals import worker_process_init, worker_process_shutdown
 from celery.utils.log import get_task_logger
 from pysnmp.hlapi import ObjectIdentity, ObjectType, SnmpEngine
 
+from splunk_connect_for_snmp_poller.manager.async_poller import (
+    BULK,
+    GET,
+    PollRequest,
+    poll_requests,
+)
 from splunk_connect_for_snmp_poller.manager.celery_client import app
+from splunk_connect_for_snmp_poller.manager.circuit_breaker import (
+    answered,
+    circuit_breaker,
+)
+from splunk_connect_for_snmp_poller.manager.const import (
+    DEFAULT_ASYNC_MAX_IN_FLIGHT,
+    DEFAULT_ASYNC_MAX_IN_FLIGHT_PER_TARGET,
+    DEFAULT_BULK_MAX_REPETITIONS,
+    DEFAULT_HEC_BACKOFF_FACTOR,
+    DEFAULT_HEC_BATCH_MAX_AGE,
+    DEFAULT_HEC_BATCH_MAX_COUNT,
+    DEFAULT_HEC_BATCH_MAX_SIZE,
+    DEFAULT_HEC_POOL_SIZE,
+    DEFAULT_HEC_RETRIES,
+)
 from splunk_connect_for_snmp_poller.manager.data.inventory_record import InventoryRecord
 from splunk_connect_for_snmp_poller.manager.hec_sender import HecSender
+from splunk_connect_for_snmp_poller.manager.mib_server_client import (
+    close_translation_client,
+    init_translation_client,
+    translation_cache,
+)
+from splunk_connect_for_snmp_poller.manager.profile_matching import varbinds_hash
 from splunk_connect_for_snmp_poller.manager.realtime.oid_constant import OidConstant
 from splunk_connect_for_snmp_poller.manager.task_utilities import (
+    BulkObservation,
+    EnrichmentSnapshot,
     OnetimeFlag,
     VarbindCollection,
-    build_authData,
-    build_contextData,
+    get_auth_and_context_data,
+    get_walk_max_repetitions,
     is_oid,
     mib_string_handler,
+    mib_view_cache,
     parse_port,
+    process_bulk_responses,
+    process_get_response,
     snmp_bulk_handler,
     snmp_get_handler,
+    update_learned_max_repetitions,
     walk_handler,
     walk_handler_with_enricher,
 )
-from splunk_connect_for_snmp_poller.mongo import WalkedHostsRepository
+from splunk_connect_for_snmp_poller.manager.variables import profile_varbinds_hash
+from splunk_connect_for_snmp_poller.mongo import (
+    ConfigRepository,
+    WalkedHostsRepository,
+    close_mongo_client,
+    init_mongo_client,
+)
 
 logger = get_task_logger(__name__)
 
@@ -108,10 +150,118 @@ def sort_varbinds(varbind_list: list) -> VarbindCollection:
     return casted_multikey_elements
 
 
+MAX_COMPILED_PROFILES = 1024
+_compiled_profiles: OrderedDict = OrderedDict()
+_compiled_profiles_lock = threading.Lock()
+
+
+def compile_profile(profile: dict) -> VarbindCollection:
+    """
+    Returns varbinds of the profile already sorted into GET/BULK lists and resolved to OIDs. The result is cached in
+    the worker process under the varBinds content hash, so each profile version is compiled only once, as long as
+    the MIB view it was resolved with is kept. Profiles with varbinds that failed to resolve are not cached, so they
+    are tried again on the next poll.
+    """
+    profile_hash = (
+        profile.get(profile_varbinds_hash) or varbinds_hash(profile),
+        mib_view_cache.generation(os.environ.get("MIBS_FILES_URL")),
+    )
+    with _compiled_profiles_lock:
+        varbind_collection = _compiled_profiles.get(profile_hash)
+        if varbind_collection is not None:
+            _compiled_profiles.move_to_end(profile_hash)
+            return varbind_collection
+    varbind_collection = sort_varbinds(profile["varBinds"])
+    if len(varbind_collection.get) + len(varbind_collection.bulk) < len(
+        profile["varBinds"]
+    ):
+        return varbind_collection
+    with _compiled_profiles_lock:
+        _compiled_profiles[profile_hash] = varbind_collection
+        while len(_compiled_profiles) > MAX_COMPILED_PROFILES:
+            _compiled_profiles.popitem(last=False)
+    return varbind_collection
+
+
+MAX_CONFIG_VERSIONS = 16
+_config_versions: OrderedDict = OrderedDict()
+_config_versions_lock = threading.Lock()
+
+
+def load_config_version(mongo_config, config_version):
+    """
+    Returns the (server_config, profiles) stored under config_version. Versions are immutable, so each of them is
+    loaded from Mongo and decoded only once per worker process.
+    """
+    with _config_versions_lock:
+        config = _config_versions.get(config_version)
+        if config is not None:
+            _config_versions.move_to_end(config_version)
+            return config
+    config = ConfigRepository(mongo_config).load(config_version)
+    if config is None:
+        return None
+    with _config_versions_lock:
+        _config_versions[config_version] = config
+        while len(_config_versions) > MAX_CONFIG_VERSIONS:
+            _config_versions.popitem(last=False)
+    return config
+
+
+def build_hec_sender() -> HecSender:
+    return HecSender(
+        os.environ["OTEL_SERVER_METRICS_URL"],
+        os.environ["OTEL_SERVER_LOGS_URL"],
+        buffered=True,
+        max_batch_count=int(
+            os.environ.get("HEC_BATCH_MAX_COUNT", DEFAULT_HEC_BATCH_MAX_COUNT)
+        ),
+        max_batch_size=int(
+            os.environ.get("HEC_BATCH_MAX_SIZE", DEFAULT_HEC_BATCH_MAX_SIZE)
+        ),
+        max_batch_age=float(
+            os.environ.get("HEC_BATCH_MAX_AGE", DEFAULT_HEC_BATCH_MAX_AGE)
+        ),
+        pool_size=int(os.environ.get("HEC_POOL_SIZE", DEFAULT_HEC_POOL_SIZE)),
+        retries=int(os.environ.get("HEC_RETRIES", DEFAULT_HEC_RETRIES)),
+        backoff_factor=float(
+            os.environ.get("HEC_BACKOFF_FACTOR", DEFAULT_HEC_BACKOFF_FACTOR)
+        ),
+    )
+
+
 class SNMPTask(Task):
+    # Shared by every task executed in the worker process, so HEC connections are kept alive between tasks
+    _hec_sender = None
+    _hec_sender_lock = threading.Lock()
+
     def __init__(self):
         self.snmp_engine = SnmpEngine()
 
+    @property
+    def hec_sender(self) -> HecSender:
+        # created lazily, so with the prefork pool every child process gets its own connection pool
+        if SNMPTask._hec_sender is None:
+            with SNMPTask._hec_sender_lock:
+                if SNMPTask._hec_sender is None:
+                    SNMPTask._hec_sender = build_hec_sender()
+        return SNMPTask._hec_sender
+
+
+@worker_process_init.connect
+def open_worker_connections(**kwargs):
+    init_translation_client()
+    init_mongo_client()
+
+
+@worker_process_shutdown.connect
+def close_worker_connections(**kwargs):
+    if SNMPTask._hec_sender is not None:
+        SNMPTask._hec_sender.close()
+    logger.info(f"Translation cache statistics: {translation_cache.statistics()}")
+    close_translation_client()
+    close_mongo_client()
+
 
 @app.task(base=SNMPTask, bind=True, ignore_result=True)
 def snmp_polling(
@@ -125,19 +275,16 @@ def snmp_polling(
     ir = InventoryRecord.from_json(ir_json)
     logger.info(f"Got one_time_flag - {one_time_flag} with Ir - {ir.__repr__()}")
 
-    hec_sender = HecSender(
-        os.environ["OTEL_SERVER_METRICS_URL"], os.environ["OTEL_SERVER_LOGS_URL"]
-    )
+    hec_sender = self.hec_sender
     mib_server_url = os.environ["MIBS_SERVER_URL"]
     host, port = parse_port(ir.host)
     logger.debug("Using the following MIBS server URL: %s", mib_server_url)
 
-    # create auth_data depending on SNMP's version
-    auth_data = build_authData(ir.version, ir.community, server_config)
+    # auth_data depends on SNMP's version, context_data is specific to SNMP v3
+    auth_data, context_data = get_auth_and_context_data(
+        ir.version, ir.community, server_config
+    )
     logger.debug("auth_data\n%s", auth_data)
-
-    # create context_data for SNMP v3
-    context_data = build_contextData(ir.version, ir.community, server_config)
     logger.debug("context_data\n%s", context_data)
 
     mongo_connection = WalkedHostsRepository(server_config["mongo"])
@@ -156,7 +303,10 @@ def snmp_polling(
         ir,
         additional_metric_fields,
     ]
-    get_bulk_specific_parameters = [mongo_connection, enricher_presence]
+    enrichment = EnrichmentSnapshot(
+        mongo_connection, enricher_presence, f"{host}:{port}"
+    )
+    get_bulk_specific_parameters = [mongo_connection, enrichment]
     try:
         # Perform SNNP Polling for string profile in inventory.csv
         if not is_oid(ir.profile):
@@ -173,7 +323,7 @@ def snmp_polling(
                     return
 
                 # Divide varBinds for WALK/BULK actions
-                varbind_collection = sort_varbinds(var_binds)
+                varbind_collection = compile_profile(mib_profile)
                 logger.debug(f"Varbind collection: {varbind_collection}")
                 # Perform SNMP BULK
                 get_snmp_data(
@@ -196,6 +346,9 @@ def snmp_polling(
             # Perform SNNP WALK for oid end with *
             if ir.profile[-1] == "*":
                 logger.info("Executing SNMP WALK for %s profile=%s", host, ir.profile)
+                walk_max_repetitions = get_walk_max_repetitions(
+                    server_config, f"{host}:{port}"
+                )
                 if ir.profile.startswith(OidConstant.IF_MIB_PREFIX) or (
                     enricher_presence and one_time_flag == OnetimeFlag.AFTER_FAIL.value
                 ):
@@ -216,6 +369,7 @@ def snmp_polling(
                         server_config,
                         mongo_connection,
                         *static_parameters,
+                        walk_max_repetitions,
                     )
                 if ir.profile == OidConstant.UNIVERSAL_BASE_OID:
                     logger.debug(
@@ -223,7 +377,12 @@ def snmp_polling(
                         host,
                         ir.profile,
                     )
-                    walk_handler(ir.profile, mongo_connection, *static_parameters)
+                    walk_handler(
+                        ir.profile,
+                        mongo_connection,
+                        *static_parameters,
+                        walk_max_repetitions,
+                    )
             # Perform SNNP GET for an oid
             else:
                 logger.info("Executing SNMP GET for %s profile=%s", host, ir.profile)
@@ -236,5 +395,216 @@ def snmp_polling(
         logger.exception(
             f"Error occurred while executing SNMP polling for {host}, version={ir.version}, profile={ir.profile}"
         )
+    finally:
+        hec_sender.flush()
 
     return f"Executing SNMP Polling for {ir.host} version={ir.version} profile={ir.profile}"
+
+
+def build_poll_requests(ir: InventoryRecord, server_config, profiles) -> list:
+    """
+    Returns the GET/BULK operations the asyncio engine has to execute to poll the inventory record
+    """
+    host, port = parse_port(ir.host)
+    auth_data, context_data = get_auth_and_context_data(
+        ir.version, ir.community, server_config
+    )
+    if is_oid(ir.profile):
+        return [
+            PollRequest(
+                GET,
+                host,
+                port,
+                auth_data,
+                context_data,
+                [ObjectType(ObjectIdentity(ir.profile))],
+                ir.address,
+                timeout=ir.timeout,
+                retries=ir.retries,
+            )
+        ]
+    mib_profile = profiles["profiles"].get(ir.profile, None)
+    if not mib_profile:
+        logger.warning(f"No profile {ir.profile} found")
+        return []
+    if not mib_profile.get("varBinds", None):
+        logger.warning(f"No varBinds specified for profile {ir.profile}")
+        return []
+    varbind_collection = compile_profile(mib_profile)
+    logger.debug(f"Varbind collection: {varbind_collection}")
+    requests = []
+    if varbind_collection.bulk:
+        requests.append(
+            PollRequest(
+                BULK,
+                host,
+                port,
+                auth_data,
+                context_data,
+                varbind_collection.bulk,
+                ir.address,
+                timeout=ir.timeout,
+                retries=ir.retries,
+            )
+        )
+    if varbind_collection.get:
+        requests.append(
+            PollRequest(
+                GET,
+                host,
+                port,
+                auth_data,
+                context_data,
+                varbind_collection.get,
+                ir.address,
+                timeout=ir.timeout,
+                retries=ir.retries,
+            )
+        )
+    return requests
+
+
+@app.task(base=SNMPTask, bind=True, ignore_result=True)
+def snmp_polling_version(self, ir_json, mongo_config, config_version, index):
+    """
+    snmp_polling with the server config and profiles loaded from a ConfigRepository version, so tasks sent by
+    snmp_polling_batch don't carry the config, and the credentials in it, through the broker.
+    """
+    config = load_config_version(mongo_config, config_version)
+    if config is None:
+        logger.error(f"Config version {config_version} not found, skipping the polling")
+        return
+    server_config, profiles = config
+    snmp_polling(ir_json, server_config, index, profiles)
+
+
+def _host_id(ir: InventoryRecord):
+    host, port = parse_port(ir.host)
+    return f"{host}:{port}"
+
+
+@app.task(base=SNMPTask, bind=True, ignore_result=True)
+def snmp_polling_batch(self, ir_jsons, mongo_config, config_version, index):
+    """
+    Polls a batch of inventory records concurrently with the asyncio SNMP engine, so the worker is not blocked on one
+    device at a time. Walks are executed once per device and are sent to the synchronous snmp_polling_version task
+    with the same config version, so a long walk doesn't hold up the rest of the batch.
+    The server config and profiles are loaded from the ConfigRepository version the batch was scheduled with.
+    Devices whose circuit breaker is open are not polled.
+    """
+    config = load_config_version(mongo_config, config_version)
+    if config is None:
+        logger.error(f"Config version {config_version} not found, skipping the batch")
+        return
+    server_config, profiles = config
+    hec_sender = self.hec_sender
+    mib_server_url = os.environ["MIBS_SERVER_URL"]
+    mongo_connection = WalkedHostsRepository(server_config["mongo"])
+    additional_metric_fields = server_config.get("additionalMetricField")
+    enricher_presence = "enricher" in server_config
+    one_time_flag = OnetimeFlag.NOT_A_WALK.value
+
+    inventory_records = [
+        (ir_json, InventoryRecord.from_json(ir_json)) for ir_json in ir_jsons
+    ]
+    breaker_states = mongo_connection.circuit_breaker_states_for(
+        {_host_id(ir) for _, ir in inventory_records}
+    )
+    polled = []
+    for ir_json, ir in inventory_records:
+        if circuit_breaker.is_open(breaker_states.get(_host_id(ir))):
+            logger.info(
+                f"Skipping SNMP polling for {ir.host} profile={ir.profile}, the device did not answer the previous "
+                f"polls"
+            )
+            continue
+        if is_oid(ir.profile) and ir.profile[-1] == "*":
+            snmp_polling_version.delay(ir_json, mongo_config, config_version, index)
+            continue
+        try:
+            polled.extend(
+                (ir, request)
+                for request in build_poll_requests(ir, server_config, profiles)
+            )
+        except Exception:
+            logger.exception(
+                f"Error occurred while preparing SNMP polling for {ir.host}, version={ir.version}, "
+                f"profile={ir.profile}"
+            )
+
+    bulk_hosts = {
+        f"{request.host}:{request.port}"
+        for _, request in polled
+        if request.operation == BULK
+    }
+    learned_max_repetitions = (
+        mongo_connection.max_repetitions_for(bulk_hosts) if bulk_hosts else {}
+    )
+    for _, request in polled:
+        if request.operation == BULK:
+            request.max_repetitions = learned_max_repetitions.get(
+                f"{request.host}:{request.port}", DEFAULT_BULK_MAX_REPETITIONS
+            )
+
+    poll_requests(
+        [request for _, request in polled],
+        int(os.environ.get("ASYNC_MAX_IN_FLIGHT", DEFAULT_ASYNC_MAX_IN_FLIGHT)),
+        int(
+            os.environ.get(
+                "ASYNC_MAX_IN_FLIGHT_PER_TARGET", DEFAULT_ASYNC_MAX_IN_FLIGHT_PER_TARGET
+            )
+        ),
+    )
+
+    enrichments = {}
+    observations = []
+    try:
+        for ir, request in polled:
+            hostname = f"{request.host}:{request.port}"
+            if hostname not in enrichments:
+                enrichments[hostname] = EnrichmentSnapshot(
+                    mongo_connection, enricher_presence, hostname
+                )
+            parameters = [
+                enrichments[hostname],
+                hec_sender,
+                request.host,
+                mib_server_url,
+                index,
+                one_time_flag,
+                ir,
+                additional_metric_fields,
+            ]
+            try:
+                if request.operation == BULK:
+                    observation = BulkObservation()
+                    observations.append(
+                        (hostname, request.max_repetitions, observation)
+                    )
+                    process_bulk_responses(
+                        observation.observe(request.responses), *parameters
+                    )
+                else:
+                    for response in request.responses:
+                        process_get_response(response, *parameters)
+            except Exception:
+                logger.exception(
+                    f"Error occurred while executing SNMP polling for {request.host}, version={ir.version}, "
+                    f"profile={ir.profile}"
+                )
+    finally:
+        hec_sender.flush()
+    update_learned_max_repetitions(mongo_connection, observations)
+
+    answers = {}
+    for _, request in polled:
+        if request.responses:
+            hostname = f"{request.host}:{request.port}"
+            answers[hostname] = answers.get(hostname, False) or answered(
+                request.responses
+            )
+    mongo_connection.update_circuit_breaker_states(
+        circuit_breaker.updated_states(breaker_states, answers)
+    )
+
+    return f"Executing SNMP Polling for {len(ir_jsons)} inventory records"
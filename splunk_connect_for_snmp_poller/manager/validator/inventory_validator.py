@@ -32,7 +32,18 @@
 # under the License.
 
 import logging
+import os
 import re
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from splunk_connect_for_snmp_poller.manager.const import (
+    DEFAULT_DNS_CACHE_TTL,
+    DEFAULT_DNS_NEGATIVE_CACHE_TTL,
+    DEFAULT_DNS_RESOLVER_THREADS,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -55,7 +66,7 @@ def is_valid_number(port, validation):
     try:
         integer_value = int(port)
         return validation(integer_value)
-    except ValueError:
+    except (TypeError, ValueError):
         logger.error(f"{port} is not a number")
         return False
 
@@ -70,6 +81,30 @@ def is_valid_port(port):
     return valid_port
 
 
+def is_valid_timeout(timeout):
+    try:
+        valid_timeout = float(timeout) > 0
+    except (TypeError, ValueError):
+        valid_timeout = False
+    if not valid_timeout:
+        logger.error(f"Timeout {timeout} is not a positive number of seconds")
+    return valid_timeout
+
+
+def is_valid_retries(retries):
+    def not_negative(number):
+        return number >= 0
+
+    valid_retries = is_valid_number(retries, not_negative)
+    if not valid_retries:
+        logger.error(f"Retries {retries} is not a number >= 0")
+    return valid_retries
+
+
+def is_empty(value):
+    return value is None or not str(value).strip()
+
+
 def is_valid_second_quantity(seconds):
     def any_positive_number(positive_number):
         return positive_number > 0
@@ -80,15 +115,69 @@ def is_valid_second_quantity(seconds):
     return valid_port
 
 
-def resolve_host(hostname):
-    import socket
+class HostResolver:
+    """
+    Resolves inventory hostnames, remembering the addresses for ttl seconds and the failures for negative_ttl
+    seconds, so reloading the inventory doesn't query DNS for every row again. resolve_all() looks up all the
+    hostnames missing in the cache in parallel, so one slow lookup doesn't delay the others.
+    """
+
+    def __init__(self, ttl, negative_ttl, threads, clock=time.monotonic):
+        self._ttl = ttl
+        self._negative_ttl = negative_ttl
+        self._threads = threads
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._addresses = {}
+
+    def resolve(self, hostname):
+        """
+        @return: the IPv4 address of hostname or None when it can't be resolved
+        """
+        with self._lock:
+            cached = self._addresses.get(hostname)
+        if cached is not None and cached[1] > self._clock():
+            return cached[0]
+        try:
+            address = socket.gethostbyname(hostname)
+        except OSError:
+            logger.error(f"Cannot resolve {hostname}")
+            address = None
+        ttl = self._ttl if address is not None else self._negative_ttl
+        with self._lock:
+            self._addresses[hostname] = (address, self._clock() + ttl)
+        return address
+
+    def resolve_all(self, hostnames):
+        now = self._clock()
+        with self._lock:
+            missing = {
+                hostname
+                for hostname in hostnames
+                if hostname not in self._addresses
+                or self._addresses[hostname][1] <= now
+            }
+        if not missing:
+            return
+        with ThreadPoolExecutor(
+            max_workers=min(self._threads, len(missing))
+        ) as executor:
+            list(executor.map(self.resolve, missing))
+
+    def clear(self):
+        with self._lock:
+            self._addresses = {}
+
+
+host_resolver = HostResolver(
+    int(os.environ.get("DNS_CACHE_TTL", DEFAULT_DNS_CACHE_TTL)),
+    int(os.environ.get("DNS_NEGATIVE_CACHE_TTL", DEFAULT_DNS_NEGATIVE_CACHE_TTL)),
+    int(os.environ.get("DNS_RESOLVER_THREADS", DEFAULT_DNS_RESOLVER_THREADS)),
+)
 
-    try:
-        socket.gethostbyname(hostname)
-        return bool(hostname)
-    except OSError:
-        logger.error(f"Cannot resolve {hostname}")
-        return False
+
+def resolve_host(hostname):
+    return host_resolver.resolve(hostname) is not None and bool(hostname)
 
 
 def is_valid_host(host):
@@ -119,7 +208,9 @@ def is_valid_profile(profile):
     return profile == DYNAMIC_PROFILE or profile_pattern.match(profile.strip())
 
 
-def is_valid_inventory_line_from_dict(host, version, community, profile, seconds):
+def is_valid_inventory_line_from_dict(
+    host, version, community, profile, seconds, timeout=None, retries=None
+):
     if None in [host, version, community, profile]:
         return False
 
@@ -129,10 +220,12 @@ def is_valid_inventory_line_from_dict(host, version, community, profile, seconds
         and is_valid_community(community.strip())
         and is_valid_profile(profile.strip())
         and (seconds is None or is_valid_second_quantity(seconds))
+        and (is_empty(timeout) or is_valid_timeout(timeout))
+        and (is_empty(retries) or is_valid_retries(retries))
     )
     if not valid_inventory_line:
         logger.error(
             f"Invalid inventory line [{host}], version = [{version}], community = [{community}], profile = [{profile}],"
-            f" seconds = [{seconds}]"
+            f" seconds = [{seconds}], timeout = [{timeout}], retries = [{retries}]"
         )
     return valid_inventory_line
@@ -19,3 +19,4 @@ enricher_oid_family = "oidFamily"
 enricher_if_mib = "IF-MIB"
 onetime_walk = "walked_first_time"
 onetime_if_walk = "ifmib_walked_first_time"
+profile_varbinds_hash = "varBindsHash"
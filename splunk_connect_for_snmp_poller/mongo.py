@@ -30,10 +30,14 @@
 # KIND, either express or implied.  See the License for the
 # specific language governing permissions and limitations
 # under the License.
+import datetime
+import hashlib
+import json
 import logging
 import os
+import threading
 
-from pymongo import MongoClient, ReturnDocument
+from pymongo import DESCENDING, MongoClient, ReturnDocument, UpdateOne
 from pymongo.errors import ConnectionFailure
 
 from .manager.variables import enricher_additional_varbinds, enricher_existing_varbinds
@@ -74,18 +78,61 @@ Each WalkedHostsRepository can contain the following fields:
 """
 
 
+"""
+MongoClient keeps its own connection pool and is thread-safe, so one client is shared by everything running in
+a process (Celery worker process or the scheduler) and WalkedHostsRepository objects are only light views on it.
+MongoClient is not fork-safe, so a client inherited from a parent process is never reused.
+"""
+_mongo_client = None
+_mongo_client_pid = None
+_mongo_client_lock = threading.Lock()
+
+
+def init_mongo_client():
+    global _mongo_client, _mongo_client_pid
+    with _mongo_client_lock:
+        if _mongo_client is None or _mongo_client_pid != os.getpid():
+            logger.debug("Creating MongoClient for process %s", os.getpid())
+            _mongo_client = MongoClient(
+                os.environ["MONGO_URI"],
+            )
+            if os.environ.get("MONGO_USER"):
+                _mongo_client.admin.authenticate(
+                    os.environ["MONGO_USER"], os.environ["MONGO_PASS"]
+                )
+            _mongo_client_pid = os.getpid()
+    return _mongo_client
+
+
+def get_mongo_client():
+    if _mongo_client is None or _mongo_client_pid != os.getpid():
+        return init_mongo_client()
+    return _mongo_client
+
+
+def close_mongo_client():
+    global _mongo_client, _mongo_client_pid
+    with _mongo_client_lock:
+        if _mongo_client is not None and _mongo_client_pid == os.getpid():
+            _mongo_client.close()
+        _mongo_client = None
+        _mongo_client_pid = None
+
+
+class UnsupportedMongoVersion(Exception):
+    pass
+
+
 class WalkedHostsRepository:
+    # update_real_time_state merges the real time data with a pipeline update, which needs MongoDB 4.2
+    MIN_SERVER_VERSION = (4, 2)
     MIB_REAL_TIME_DATA = "MIB-REAL-TIME-DATA"
     MIB_STATIC_DATA = "MIB-STATIC-DATA"
+    MAX_REPETITIONS = "maxRepetitions"
+    CIRCUIT_BREAKER = "circuitBreaker"
 
     def __init__(self, mongo_config):
-        self._client = MongoClient(
-            os.environ["MONGO_URI"],
-        )
-        if os.environ.get("MONGO_USER"):
-            self._client.admin.authenticate(
-                os.environ["MONGO_USER"], os.environ["MONGO_PASS"]
-            )
+        self._client = get_mongo_client()
 
         self._walked_hosts = self._client[mongo_config["database"]][
             mongo_config["walked_collection"]
@@ -101,6 +148,14 @@ class WalkedHostsRepository:
         except ConnectionFailure:
             return False
 
+    def check_server_version(self):
+        version = tuple(self._client.server_info()["versionArray"][:2])
+        if version < WalkedHostsRepository.MIN_SERVER_VERSION:
+            required = ".".join(map(str, WalkedHostsRepository.MIN_SERVER_VERSION))
+            raise UnsupportedMongoVersion(
+                f"MongoDB {'.'.join(map(str, version))} is not supported, {required} or newer is required"
+            )
+
     def contains_host(self, host):
         return self._walked_hosts.find({"_id": host}).count()
 
@@ -157,6 +212,121 @@ class WalkedHostsRepository:
         else:
             return None
 
+    def real_time_state_for(self, hosts, flag_name):
+        """
+        Loads with one query the walk flag and the real time data of all the hosts.
+        Returns a dictionary host -> (walk was initiated, real time data or None), hosts missing in the collection
+        are not included.
+        """
+        documents = self._walked_hosts.find(
+            {"_id": {"$in": list(hosts)}},
+            {flag_name: 1, WalkedHostsRepository.MIB_REAL_TIME_DATA: 1},
+        )
+        return {
+            document["_id"]: (
+                document.get(flag_name) is True,
+                document.get(WalkedHostsRepository.MIB_REAL_TIME_DATA),
+            )
+            for document in documents
+        }
+
+    def update_real_time_state(self, real_time_data, walked_hosts, flag_name):
+        """
+        Stores with one bulk write the real time data of all the hosts (a dictionary host -> real time data) and sets
+        the walk flag for walked_hosts. Hosts missing in the collection are added.
+        The real time data is merged into the stored one, so fields written meanwhile by the walks are kept. The keys
+        are OIDs, which contain dots, so they are merged with a pipeline update instead of $set on their paths.
+        """
+        operations = []
+        for host, input_dictionary in real_time_data.items():
+            element = {
+                WalkedHostsRepository.MIB_REAL_TIME_DATA: {
+                    "$mergeObjects": [
+                        {
+                            "$ifNull": [
+                                f"${WalkedHostsRepository.MIB_REAL_TIME_DATA}",
+                                {},
+                            ]
+                        },
+                        {"$literal": input_dictionary},
+                    ]
+                }
+            }
+            if host in walked_hosts:
+                element[flag_name] = True
+            operations.append(
+                UpdateOne({"_id": host}, [{"$set": element}], upsert=True)
+            )
+        if operations:
+            logger.debug(f"Updating real time data for {len(operations)} hosts")
+            self._walked_hosts.bulk_write(operations, ordered=False)
+
+    def max_repetitions_for(self, hosts):
+        """
+        Loads with one query the max-repetitions learned for BULK requests to the hosts. Returns a dictionary
+        host -> max-repetitions, hosts without a learned value are not included.
+        """
+        documents = self._walked_hosts.find(
+            {
+                "_id": {"$in": list(hosts)},
+                WalkedHostsRepository.MAX_REPETITIONS: {"$exists": True},
+            },
+            {WalkedHostsRepository.MAX_REPETITIONS: 1},
+        )
+        return {
+            document["_id"]: document[WalkedHostsRepository.MAX_REPETITIONS]
+            for document in documents
+        }
+
+    def update_max_repetitions(self, max_repetitions):
+        """
+        Stores with one bulk write the max-repetitions of the hosts, given as a dictionary host -> max-repetitions
+        """
+        operations = [
+            UpdateOne(
+                {"_id": host},
+                {"$set": {WalkedHostsRepository.MAX_REPETITIONS: value}},
+                upsert=True,
+            )
+            for host, value in max_repetitions.items()
+        ]
+        if operations:
+            logger.debug(f"Updating max-repetitions for {len(operations)} hosts")
+            self._walked_hosts.bulk_write(operations, ordered=False)
+
+    def circuit_breaker_states_for(self, hosts):
+        """
+        Loads with one query the circuit breaker states of the hosts. Returns a dictionary host -> state, hosts
+        without failures are not included.
+        """
+        documents = self._walked_hosts.find(
+            {
+                "_id": {"$in": list(hosts)},
+                WalkedHostsRepository.CIRCUIT_BREAKER: {"$exists": True},
+            },
+            {WalkedHostsRepository.CIRCUIT_BREAKER: 1},
+        )
+        return {
+            document["_id"]: document[WalkedHostsRepository.CIRCUIT_BREAKER]
+            for document in documents
+        }
+
+    def update_circuit_breaker_states(self, states):
+        """
+        Stores with one bulk write the circuit breaker states of the hosts, given as a dictionary host -> state.
+        A state None removes the state of the host.
+        """
+        operations = []
+        for host, state in states.items():
+            if state is None:
+                update = {"$unset": {WalkedHostsRepository.CIRCUIT_BREAKER: ""}}
+            else:
+                update = {"$set": {WalkedHostsRepository.CIRCUIT_BREAKER: state}}
+            operations.append(UpdateOne({"_id": host}, update, upsert=True))
+        if operations:
+            logger.debug(f"Updating circuit breaker states for {len(operations)} hosts")
+            self._walked_hosts.bulk_write(operations, ordered=False)
+
     def static_data_for(self, host):
         full_collection = self._walked_hosts.find_one({"_id": host})
         if not full_collection:
@@ -235,3 +405,71 @@ class WalkedHostsRepository:
             {},
             {"$unset": {"MIB-STATIC-DATA": ""}},
         )
+
+
+class ConfigRepository:
+    """
+    Versioned store of the server config and profiles the poller schedules polls with. Every version is stored once
+    under the hash of its content, so polling tasks only carry the hash and workers load each version once.
+    The config is kept as a JSON string, as its keys (community names, usernames, ...) are not valid Mongo field names.
+    The mongo section of the server config is not stored, workers get it with the task, and only the MAX_VERSIONS
+    most recently stored versions are kept.
+    """
+
+    DEFAULT_COLLECTION = "config_versions"
+    MAX_VERSIONS = 64
+
+    def __init__(self, mongo_config):
+        self._mongo_config = mongo_config
+        self._configs = get_mongo_client()[mongo_config["database"]][
+            mongo_config.get("config_collection", ConfigRepository.DEFAULT_COLLECTION)
+        ]
+
+    @staticmethod
+    def encode(server_config, profiles):
+        server_config = {
+            key: value for key, value in server_config.items() if key != "mongo"
+        }
+        encoded = json.dumps(
+            {"server_config": server_config, "profiles": profiles},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha1(encoded.encode()).hexdigest(), encoded
+
+    def store(self, server_config, profiles):
+        config_version, encoded = ConfigRepository.encode(server_config, profiles)
+        logger.debug(f"Storing config version {config_version}")
+        self._configs.update_one(
+            {"_id": config_version},
+            {
+                "$set": {"storedAt": datetime.datetime.utcnow()},
+                "$setOnInsert": {"config": encoded},
+            },
+            upsert=True,
+        )
+        try:
+            self._delete_old_versions()
+        except Exception:
+            logger.exception("Error while deleting old config versions")
+        return config_version
+
+    def load(self, config_version):
+        document = self._configs.find_one({"_id": config_version})
+        if not document:
+            return None
+        decoded = json.loads(document["config"])
+        server_config = decoded["server_config"]
+        server_config["mongo"] = self._mongo_config
+        return server_config, decoded["profiles"]
+
+    def _delete_old_versions(self):
+        old_versions = [
+            document["_id"]
+            for document in self._configs.find({}, {"_id": 1})
+            .sort("storedAt", DESCENDING)
+            .skip(ConfigRepository.MAX_VERSIONS)
+        ]
+        if old_versions:
+            logger.debug(f"Deleting {len(old_versions)} old config versions")
+            self._configs.delete_many({"_id": {"$in": old_versions}})
@@ -37,7 +37,8 @@ class TestInventoryRecord(TestCase):
         expected_str = (
             '{"host": "test_host", "version": "test_version", '
             '"community": "test_public", "profile": "test_profile",'
-            ' "frequency_str": "10"}'
+            ' "frequency_str": "10", "address": null, '
+            '"timeout": null, "retries": null}'
         )
 
         ir_to_json = ir.to_json()
@@ -13,6 +13,20 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+from splunk_connect_for_snmp_poller.manager.data.inventory_snapshot import (
+    InventorySnapshot,
+)
+
+
+def snapshot(*records):
+    """
+    Inventory snapshot of the given records, keyed by their entry keys as load_inventory_snapshot() does
+    """
+    return InventorySnapshot(
+        "version", {f"{ir.host}#{ir.profile}": ir for ir in records}
+    )
+
+
 class InventoryLineBuilder:
     def skipped_or_empty_configurations(self):
         return ["# ignore", "     #", "", "      "]
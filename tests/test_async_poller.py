@@ -0,0 +1,69 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from unittest import TestCase
+
+from pysnmp.proto.rfc1902 import Integer, ObjectName
+from pysnmp.proto.rfc1905 import endOfMibView
+
+from splunk_connect_for_snmp_poller.manager.async_poller import trim_bulk_table
+
+
+def _row(*oids):
+    return [(ObjectName(oid), Integer(1)) for oid in oids]
+
+
+class TestAsyncPoller(TestCase):
+    def test_trim_bulk_table_keeps_rows_in_subtree(self):
+        initial_vars = [ObjectName("1.3.6.1.2.1.2.2.1.10")]
+        table = [_row("1.3.6.1.2.1.2.2.1.10.1"), _row("1.3.6.1.2.1.2.2.1.10.2")]
+
+        rows, stop = trim_bulk_table(table, initial_vars, [False], _row("1.3"))
+
+        self.assertFalse(stop)
+        self.assertEqual(2, len(rows))
+
+    def test_trim_bulk_table_stops_when_all_columns_left_subtree(self):
+        initial_vars = [ObjectName("1.3.6.1.2.1.2.2.1.10")]
+        table = [
+            _row("1.3.6.1.2.1.2.2.1.10.1"),
+            _row("1.3.6.1.2.1.2.2.1.11.1"),
+            _row("1.3.6.1.2.1.2.2.1.11.2"),
+        ]
+
+        rows, stop = trim_bulk_table(table, initial_vars, [False], _row("1.3"))
+
+        self.assertTrue(stop)
+        self.assertEqual(1, len(rows))
+
+    def test_trim_bulk_table_marks_finished_column(self):
+        initial_vars = [
+            ObjectName("1.3.6.1.2.1.2.2.1.10"),
+            ObjectName("1.3.6.1.2.1.2.2.1.16"),
+        ]
+        null_var_binds = [False, False]
+        table = [
+            _row("1.3.6.1.2.1.2.2.1.10.1", "1.3.6.1.2.1.2.2.1.16.1"),
+            _row("1.3.6.1.2.1.2.2.1.11.1", "1.3.6.1.2.1.2.2.1.16.2"),
+        ]
+
+        rows, stop = trim_bulk_table(
+            table, initial_vars, null_var_binds, _row("1.3", "1.3")
+        )
+
+        self.assertFalse(stop)
+        self.assertEqual([True, False], null_var_binds)
+        self.assertEqual(endOfMibView, rows[1][0][1])
+        self.assertEqual(ObjectName("1.3.6.1.2.1.2.2.1.10.1"), rows[1][0][0])
@@ -0,0 +1,76 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from unittest import TestCase
+
+from pysnmp.proto import errind
+
+from splunk_connect_for_snmp_poller.manager.circuit_breaker import (
+    CircuitBreaker,
+    answered,
+)
+
+
+class TestCircuitBreaker(TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        self.circuit_breaker = CircuitBreaker(2, 60, 200, clock=lambda: self.now)
+
+    def test_opens_after_threshold_failures(self):
+        state = self.circuit_breaker.next_state(None, False)
+        self.assertEqual({"failures": 1}, state)
+        self.assertFalse(self.circuit_breaker.is_open(state))
+
+        state = self.circuit_breaker.next_state(state, False)
+        self.assertEqual({"failures": 2, "openUntil": 1060.0}, state)
+        self.assertTrue(self.circuit_breaker.is_open(state))
+
+        self.now = 1060.0
+        self.assertFalse(self.circuit_breaker.is_open(state))
+
+    def test_backoff_doubles_up_to_maximum(self):
+        state = {"failures": 2, "openUntil": 1000.0}
+
+        state = self.circuit_breaker.next_state(state, False)
+        self.assertEqual(1120.0, state["openUntil"])
+        state = self.circuit_breaker.next_state(state, False)
+        self.assertEqual(1200.0, state["openUntil"])
+
+    def test_answer_closes_breaker(self):
+        self.assertIsNone(
+            self.circuit_breaker.next_state({"failures": 5, "openUntil": 0}, True)
+        )
+
+    def test_disabled_with_zero_threshold(self):
+        circuit_breaker = CircuitBreaker(0, 60, 200)
+
+        self.assertIsNone(circuit_breaker.next_state({"failures": 5}, False))
+
+    def test_updated_states_contains_only_changes(self):
+        states = {"host1:161": {"failures": 1}}
+
+        updated = self.circuit_breaker.updated_states(
+            states, {"host1:161": True, "host2:161": True, "host3:161": False}
+        )
+
+        self.assertEqual({"host1:161": None, "host3:161": {"failures": 1}}, updated)
+
+    def test_answered(self):
+        timeout = (errind.requestTimedOut, 0, 0, [])
+        auth_error = (errind.unknownUserName, 0, 0, [])
+
+        self.assertFalse(answered([timeout]))
+        self.assertTrue(answered([timeout, auth_error]))
+        self.assertTrue(answered([(None, 0, 0, [])]))
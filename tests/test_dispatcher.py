@@ -0,0 +1,107 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import sys
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from splunk_connect_for_snmp_poller.manager.data.inventory_record import InventoryRecord
+
+sys.modules["splunk_connect_for_snmp_poller.manager.celery_client"] = Mock()
+from splunk_connect_for_snmp_poller.manager.dispatcher import (  # noqa: E402
+    BatchDispatcher,
+)
+
+
+def _ir(host):
+    return InventoryRecord(host, "2c", "public", "profile", "60")
+
+
+@patch("splunk_connect_for_snmp_poller.manager.dispatcher.ConfigRepository")
+@patch("splunk_connect_for_snmp_poller.manager.dispatcher.snmp_polling_batch")
+class TestBatchDispatcher(TestCase):
+    def test_due_polls_are_sent_in_chunks(
+        self, m_snmp_polling_batch, m_config_repository
+    ):
+        m_config_repository.return_value.store.return_value = "version1"
+        dispatcher = BatchDispatcher(batch_size=2)
+        server_config, profiles = {"mongo": {"database": "db"}}, {"profiles": {}}
+        for host in ("10.0.0.1", "10.0.0.2", "10.0.0.3"):
+            dispatcher.add(_ir(host), server_config, {"event_index": "e"}, profiles)
+
+        dispatcher.flush()
+
+        self.assertEqual(2, m_snmp_polling_batch.delay.call_count)
+        first, second = m_snmp_polling_batch.delay.call_args_list
+        self.assertEqual(2, len(first.args[0]))
+        self.assertEqual(1, len(second.args[0]))
+        self.assertEqual(
+            ({"database": "db"}, "version1", {"event_index": "e"}), first.args[1:]
+        )
+        m_config_repository.return_value.store.assert_called_once_with(
+            server_config, profiles
+        )
+
+    def test_polls_with_different_config_are_not_mixed(
+        self, m_snmp_polling_batch, m_config_repository
+    ):
+        dispatcher = BatchDispatcher(batch_size=10)
+        indexes = {"event_index": "e"}
+        dispatcher.add(_ir("10.0.0.1"), {"mongo": {}, "version": 1}, indexes, {})
+        dispatcher.add(_ir("10.0.0.2"), {"mongo": {}, "version": 2}, indexes, {})
+
+        dispatcher.flush()
+
+        self.assertEqual(2, m_snmp_polling_batch.delay.call_count)
+
+    def test_config_version_is_stored_once(
+        self, m_snmp_polling_batch, m_config_repository
+    ):
+        dispatcher = BatchDispatcher(batch_size=10)
+        server_config, profiles = {"mongo": {}}, {}
+
+        for _ in range(3):
+            dispatcher.add(_ir("10.0.0.1"), server_config, {}, profiles)
+            dispatcher.flush()
+
+        self.assertEqual(3, m_snmp_polling_batch.delay.call_count)
+        m_config_repository.return_value.store.assert_called_once()
+
+    def test_flush_sends_polls_once(self, m_snmp_polling_batch, m_config_repository):
+        dispatcher = BatchDispatcher(batch_size=10)
+        dispatcher.add(_ir("10.0.0.1"), {"mongo": {}}, {}, {})
+
+        dispatcher.flush()
+        dispatcher.flush()
+
+        m_snmp_polling_batch.delay.assert_called_once()
+
+    def test_polls_are_requeued_when_dispatch_fails(
+        self, m_snmp_polling_batch, m_config_repository
+    ):
+        m_config_repository.return_value.store.side_effect = [
+            Exception("mongo is down"),
+            "version1",
+        ]
+        dispatcher = BatchDispatcher(batch_size=10)
+        server_config, profiles = {"mongo": {}}, {}
+        dispatcher.add(_ir("10.0.0.1"), server_config, {}, profiles)
+
+        dispatcher.flush()
+        dispatcher.add(_ir("10.0.0.1"), server_config, {}, profiles)
+        dispatcher.flush()
+
+        m_snmp_polling_batch.delay.assert_called_once()
+        self.assertEqual(1, len(m_snmp_polling_batch.delay.call_args.args[0]))
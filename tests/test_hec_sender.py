@@ -18,6 +18,7 @@ from unittest import TestCase
 from unittest.mock import patch
 
 import pytest as pytest
+import requests
 import responses
 from responses.matchers import json_params_matcher
 
@@ -242,6 +243,89 @@ class TestHecSender(TestCase):
                 log.output[0],
             )
 
+    def test_create_session_uses_bounded_pool(self):
+        session = HecSender.create_session(pool_size=4, retries=2, backoff_factor=1)
+        adapter = session.get_adapter("https://test_event_endpoint")
+        self.assertEqual(adapter._pool_maxsize, 4)
+        self.assertTrue(adapter._pool_block)
+        self.assertEqual(adapter.max_retries.total, 2)
+
+    @responses.activate
+    def test_buffered_send_flushes_on_max_count(self):
+        # given
+        responses.add(responses.POST, "http://test_metrics_endpoint", status=200)
+        hec_sender = HecSender(
+            "http://test_metrics_endpoint",
+            "http://test_event_endpoint",
+            buffered=True,
+            max_batch_count=2,
+        )
+
+        # when
+        first = hec_sender.send_hec_request(True, {"index": "test_index", "n": 1})
+        second = hec_sender.send_hec_request(True, {"index": "test_index", "n": 2})
+
+        # then
+        self.assertIsNone(first)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(len(responses.calls), 1)
+        body = responses.calls[0].request.body
+        self.assertEqual(
+            [json.loads(line) for line in body.split("\n")],
+            [{"index": "test_index", "n": 1}, {"index": "test_index", "n": 2}],
+        )
+
+    @responses.activate
+    def test_buffered_send_keeps_metrics_and_events_apart(self):
+        # given
+        responses.add(responses.POST, "http://test_metrics_endpoint", status=200)
+        responses.add(responses.POST, "http://test_event_endpoint", status=200)
+        hec_sender = HecSender(
+            "http://test_metrics_endpoint", "http://test_event_endpoint", buffered=True
+        )
+
+        # when
+        hec_sender.send_hec_request(True, {"index": "metric_index"})
+        hec_sender.send_hec_request(False, {"index": "event_index"})
+        hec_sender.send_hec_request(False, {"index": "event_index"})
+        self.assertEqual(len(responses.calls), 0)
+        hec_sender.flush()
+
+        # then
+        self.assertEqual(len(responses.calls), 2)
+        calls = {call.request.url: call.request.body for call in responses.calls}
+        self.assertEqual(calls["http://test_metrics_endpoint/"].count("\n"), 0)
+        self.assertEqual(calls["http://test_event_endpoint/"].count("\n"), 1)
+
+    def test_flush_logs_failed_batch_instead_of_raising(self):
+        hec_sender = HecSender(
+            "http://test_metrics_endpoint", "http://test_event_endpoint", buffered=True
+        )
+        hec_sender.send_hec_request(True, {"index": "metric_index"})
+
+        with patch.object(
+            hec_sender._session,
+            "post",
+            side_effect=requests.exceptions.RetryError("too many 503 error responses"),
+        ):
+            with self.assertLogs(level="ERROR") as log:
+                hec_sender.flush()
+
+        self.assertIn("Error when sending batch of 1 events to HEC", log.output[0])
+
+    def test_create_session_returns_last_response_when_retries_run_out(self):
+        session = HecSender.create_session(pool_size=4, retries=2, backoff_factor=1)
+        adapter = session.get_adapter("https://test_event_endpoint")
+        self.assertFalse(adapter.max_retries.raise_on_status)
+
+    @responses.activate
+    def test_flush_without_buffered_data(self):
+        hec_sender = HecSender(
+            "http://test_metrics_endpoint", "http://test_event_endpoint", buffered=True
+        )
+        hec_sender.flush()
+        self.assertEqual(len(responses.calls), 0)
+
     @patch("splunk_connect_for_snmp_poller.manager.hec_sender.HecSender")
     @patch(
         "splunk_connect_for_snmp_poller.manager.data.inventory_record.InventoryRecord"
@@ -14,9 +14,10 @@
 # limitations under the License.
 #
 import logging
-from unittest import TestCase
+from unittest import TestCase, mock
 
 from splunk_connect_for_snmp_poller.manager.validator.inventory_validator import (
+    HostResolver,
     is_valid_inventory_line_from_dict,
     is_valid_profile,
     should_process_inventory_line,
@@ -64,8 +65,68 @@ class TestInventoryLine(TestCase):
             logger.info(f"Invalid SNMP protocol version: {line}")
             self.assertFalse(is_valid_inventory_line(line))
 
+    def test_timeout_and_retries(self):
+        line = ["127.0.0.1", "2c", "public", "router", "1"]
+        self.assertTrue(is_valid_inventory_line_from_dict(*line))
+        self.assertTrue(is_valid_inventory_line_from_dict(*line, "", ""))
+        self.assertTrue(is_valid_inventory_line_from_dict(*line, "0.5", "0"))
+        self.assertFalse(is_valid_inventory_line_from_dict(*line, "fast", "1"))
+        self.assertFalse(is_valid_inventory_line_from_dict(*line, "0", "1"))
+        self.assertFalse(is_valid_inventory_line_from_dict(*line, "1", "-1"))
+        self.assertFalse(is_valid_inventory_line_from_dict(*line, "1", "1.5"))
+
     def test_invalid_profile_name(self):
         self.assertFalse(is_valid_profile("asd sa"))
         self.assertFalse(is_valid_profile("&asd"))
         self.assertTrue(is_valid_profile("1_asd-asds"))
         self.assertTrue(is_valid_profile("*"))
+
+
+class TestHostResolver(TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        self.resolver = HostResolver(300, 30, 4, clock=lambda: self.now)
+
+    @mock.patch(
+        "splunk_connect_for_snmp_poller.manager.validator.inventory_validator.socket.gethostbyname"
+    )
+    def test_resolve_is_cached_until_ttl(self, m_gethostbyname):
+        m_gethostbyname.return_value = "192.168.0.1"
+
+        self.assertEqual("192.168.0.1", self.resolver.resolve("device"))
+        self.now += 299
+        self.assertEqual("192.168.0.1", self.resolver.resolve("device"))
+        self.assertEqual(1, m_gethostbyname.call_count)
+
+        self.now += 1
+        self.resolver.resolve("device")
+        self.assertEqual(2, m_gethostbyname.call_count)
+
+    @mock.patch(
+        "splunk_connect_for_snmp_poller.manager.validator.inventory_validator.socket.gethostbyname"
+    )
+    def test_failures_are_cached_until_negative_ttl(self, m_gethostbyname):
+        m_gethostbyname.side_effect = OSError()
+
+        self.assertIsNone(self.resolver.resolve("unknown"))
+        self.now += 29
+        self.assertIsNone(self.resolver.resolve("unknown"))
+        self.assertEqual(1, m_gethostbyname.call_count)
+
+        self.now += 1
+        m_gethostbyname.side_effect = None
+        m_gethostbyname.return_value = "192.168.0.2"
+        self.assertEqual("192.168.0.2", self.resolver.resolve("unknown"))
+
+    @mock.patch(
+        "splunk_connect_for_snmp_poller.manager.validator.inventory_validator.socket.gethostbyname"
+    )
+    def test_resolve_all_only_looks_up_missing_hosts(self, m_gethostbyname):
+        m_gethostbyname.side_effect = lambda hostname: f"address-of-{hostname}"
+        self.resolver.resolve("device1")
+
+        self.resolver.resolve_all(["device1", "device2", "device3", "device2"])
+
+        self.assertEqual(3, m_gethostbyname.call_count)
+        self.assertEqual("address-of-device3", self.resolver.resolve("device3"))
+        self.assertEqual(3, m_gethostbyname.call_count)
@@ -0,0 +1,143 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import json
+from unittest import TestCase
+from unittest.mock import patch
+
+import responses
+from pysnmp.proto.rfc1902 import Counter32, ObjectName, OctetString
+
+from splunk_connect_for_snmp_poller.manager.mib_server_client import (
+    SharedException,
+    TranslationCache,
+    close_translation_client,
+    get_translation_client,
+    get_url,
+)
+
+
+class TestMibServerClient(TestCase):
+    def tearDown(self):
+        close_translation_client()
+
+    def test_translation_client_is_reused(self):
+        first = get_translation_client()
+        second = get_translation_client()
+        self.assertIs(first, second)
+
+    def test_translation_client_is_recreated_after_close(self):
+        first = get_translation_client()
+        close_translation_client()
+        self.assertIsNot(first, get_translation_client())
+
+    def test_pool_statistics_without_requests(self):
+        self.assertEqual(
+            get_translation_client().pool_statistics(),
+            {"requests": 0, "connections": 0, "pool_hits": 0},
+        )
+
+    @responses.activate
+    def test_get_url(self):
+        responses.add(
+            responses.POST,
+            "http://mib_server/translation?data_format=TEXT",
+            body='IF-MIB::ifDescr.1="lo"',
+            status=200,
+        )
+        result = get_url("http://mib_server", "{}", "TEXT")
+        self.assertEqual(result, 'IF-MIB::ifDescr.1="lo"')
+
+    @responses.activate
+    def test_get_url_with_error(self):
+        responses.add(
+            responses.POST,
+            "http://mib_server/translation?data_format=TEXT",
+            status=404,
+        )
+        with self.assertRaises(SharedException):
+            get_url("http://mib_server", "{}", "TEXT")
+
+
+def metric_var_bind(value):
+    return ObjectName("1.3.6.1.2.1.2.2.1.10.1"), Counter32(value)
+
+
+class TestTranslationCache(TestCase):
+    def test_metric_template_is_used_for_new_values(self):
+        cache = TranslationCache(10, 60)
+        translation = json.dumps(
+            {
+                "metric_name": "sc4snmp.IF-MIB.ifInOctets_1",
+                "_value": "10",
+                "metric_type": "Counter32",
+                "parsed_index": {"ifIndex": "1"},
+            }
+        )
+        cache.put(metric_var_bind(10), "METRIC", translation)
+        result = json.loads(cache.get(metric_var_bind(20), "METRIC"))
+        self.assertEqual(result["_value"], "20")
+        self.assertEqual(result["metric_name"], "sc4snmp.IF-MIB.ifInOctets_1")
+        self.assertEqual(result["parsed_index"], {"ifIndex": "1"})
+        self.assertIsNone(cache.get(metric_var_bind(20), "TEXT"))
+
+    def test_metric_with_changed_value_is_cached_only_for_that_value(self):
+        cache = TranslationCache(10, 60)
+        translation = '{"metric_name": "sc4snmp.IF-MIB.ifInOctets_1", "_value": "up"}'
+        cache.put(metric_var_bind(1), "METRIC", translation)
+        self.assertEqual(cache.get(metric_var_bind(1), "METRIC"), translation)
+        self.assertIsNone(cache.get(metric_var_bind(2), "METRIC"))
+
+    def test_text_translation_is_cached_for_the_same_value(self):
+        cache = TranslationCache(10, 60)
+        var_bind = ObjectName("1.3.6.1.2.1.2.2.1.2.1"), OctetString("lo")
+        cache.put(var_bind, "TEXT", 'IF-MIB::ifDescr.1="lo"')
+        self.assertEqual(cache.get(var_bind, "TEXT"), 'IF-MIB::ifDescr.1="lo"')
+        other = ObjectName("1.3.6.1.2.1.2.2.1.2.1"), OctetString("eth0")
+        self.assertIsNone(cache.get(other, "TEXT"))
+
+    def test_expired_entries_are_dropped(self):
+        cache = TranslationCache(10, 60)
+        with patch(
+            "splunk_connect_for_snmp_poller.manager.mib_server_client.time.time",
+            return_value=1000,
+        ):
+            cache.put(metric_var_bind(1), "TEXT", "translation")
+        with patch(
+            "splunk_connect_for_snmp_poller.manager.mib_server_client.time.time",
+            return_value=1061,
+        ):
+            self.assertIsNone(cache.get(metric_var_bind(1), "TEXT"))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = TranslationCache(2, 60)
+        cache.put(metric_var_bind(1), "TEXT", "first")
+        cache.put(metric_var_bind(2), "TEXT", "second")
+        cache.get(metric_var_bind(1), "TEXT")
+        cache.put(metric_var_bind(3), "TEXT", "third")
+        self.assertEqual(cache.get(metric_var_bind(1), "TEXT"), "first")
+        self.assertIsNone(cache.get(metric_var_bind(2), "TEXT"))
+
+    def test_disabled_cache(self):
+        cache = TranslationCache(0, 60)
+        cache.put(metric_var_bind(1), "TEXT", "translation")
+        self.assertIsNone(cache.get(metric_var_bind(1), "TEXT"))
+
+    def test_statistics(self):
+        cache = TranslationCache(10, 60)
+        cache.put(metric_var_bind(1), "TEXT", "translation")
+        cache.get(metric_var_bind(1), "TEXT")
+        cache.get(metric_var_bind(2), "TEXT")
+        self.assertEqual({"entries": 1, "hits": 1, "misses": 1}, cache.statistics())
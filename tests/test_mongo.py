@@ -0,0 +1,187 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import os
+from unittest import TestCase
+from unittest.mock import patch
+
+from splunk_connect_for_snmp_poller.mongo import (
+    ConfigRepository,
+    UnsupportedMongoVersion,
+    WalkedHostsRepository,
+    close_mongo_client,
+    get_mongo_client,
+)
+
+mongo_config = {
+    "database": "sc4snmp",
+    "walked_collection": "walked_hosts",
+    "unwalked_collection": "unwalked_hosts",
+}
+
+
+@patch.dict(os.environ, {"MONGO_URI": "mongodb://localhost:27017"})
+@patch("splunk_connect_for_snmp_poller.mongo.MongoClient")
+class TestMongoClient(TestCase):
+    def tearDown(self):
+        close_mongo_client()
+
+    def test_client_is_shared_between_repositories(self, mongo_client):
+        first = WalkedHostsRepository(mongo_config)
+        second = WalkedHostsRepository(mongo_config)
+        self.assertEqual(mongo_client.call_count, 1)
+        self.assertIs(first._client, second._client)
+
+    def test_client_is_recreated_after_fork(self, mongo_client):
+        get_mongo_client()
+        with patch(
+            "splunk_connect_for_snmp_poller.mongo.os.getpid",
+            return_value=os.getpid() + 1,
+        ):
+            get_mongo_client()
+        self.assertEqual(mongo_client.call_count, 2)
+
+    def test_close_client(self, mongo_client):
+        client = get_mongo_client()
+        close_mongo_client()
+        client.close.assert_called_once()
+        get_mongo_client()
+        self.assertEqual(mongo_client.call_count, 2)
+
+    def test_real_time_state_is_loaded_with_one_query(self, mongo_client):
+        repository = WalkedHostsRepository(mongo_config)
+        repository._walked_hosts.find.return_value = [
+            {"_id": "host1:161", "flag": True, "MIB-REAL-TIME-DATA": {"a": 1}},
+            {"_id": "host2:161"},
+        ]
+
+        state = repository.real_time_state_for(["host1:161", "host2:161"], "flag")
+
+        repository._walked_hosts.find.assert_called_once()
+        self.assertEqual(
+            {"host1:161": (True, {"a": 1}), "host2:161": (False, None)}, state
+        )
+
+    def test_real_time_state_is_updated_with_one_bulk_write(self, mongo_client):
+        repository = WalkedHostsRepository(mongo_config)
+
+        repository.update_real_time_state(
+            {"host1:161": {"a": 1}, "host2:161": {"a": 2}}, {"host2:161"}, "flag"
+        )
+
+        repository._walked_hosts.bulk_write.assert_called_once()
+        operations = repository._walked_hosts.bulk_write.call_args.args[0]
+
+        def merged(data):
+            return {
+                "$mergeObjects": [
+                    {"$ifNull": ["$MIB-REAL-TIME-DATA", {}]},
+                    {"$literal": data},
+                ]
+            }
+
+        self.assertEqual(
+            [
+                [{"$set": {"MIB-REAL-TIME-DATA": merged({"a": 1})}}],
+                [{"$set": {"MIB-REAL-TIME-DATA": merged({"a": 2}), "flag": True}}],
+            ],
+            [operation._doc for operation in operations],
+        )
+
+    def test_old_server_version_is_rejected(self, mongo_client):
+        repository = WalkedHostsRepository(mongo_config)
+        mongo_client.return_value.server_info.return_value = {
+            "versionArray": [4, 2, 1, 0]
+        }
+        repository.check_server_version()
+
+        mongo_client.return_value.server_info.return_value = {
+            "versionArray": [4, 0, 27, 0]
+        }
+        with self.assertRaises(UnsupportedMongoVersion):
+            repository.check_server_version()
+
+    def test_circuit_breaker_states_are_updated_in_bulk(self, mongo_client):
+        repository = WalkedHostsRepository(mongo_config)
+
+        repository.update_circuit_breaker_states(
+            {"host1:161": {"failures": 1}, "host2:161": None}
+        )
+
+        operations = repository._walked_hosts.bulk_write.call_args.args[0]
+        self.assertEqual(
+            [
+                {"$set": {"circuitBreaker": {"failures": 1}}},
+                {"$unset": {"circuitBreaker": ""}},
+            ],
+            [operation._doc for operation in operations],
+        )
+
+    def test_max_repetitions_are_loaded_and_updated_in_bulk(self, mongo_client):
+        repository = WalkedHostsRepository(mongo_config)
+        repository._walked_hosts.find.return_value = [
+            {"_id": "host1:161", "maxRepetitions": 25},
+        ]
+
+        learned = repository.max_repetitions_for(["host1:161", "host2:161"])
+        repository.update_max_repetitions({"host1:161": 12, "host2:161": 62})
+
+        self.assertEqual({"host1:161": 25}, learned)
+        operations = repository._walked_hosts.bulk_write.call_args.args[0]
+        self.assertEqual(
+            [{"$set": {"maxRepetitions": 12}}, {"$set": {"maxRepetitions": 62}}],
+            [operation._doc for operation in operations],
+        )
+
+    def test_config_version_depends_only_on_content(self, mongo_client):
+        first, _ = ConfigRepository.encode({"a": 1, "b": 2}, {"profiles": {}})
+        second, _ = ConfigRepository.encode({"b": 2, "a": 1}, {"profiles": {}})
+        third, _ = ConfigRepository.encode({"a": 1, "b": 3}, {"profiles": {}})
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, third)
+
+    def test_config_is_loaded_from_stored_version(self, mongo_client):
+        repository = ConfigRepository(mongo_config)
+        server_config = {
+            "communities": {"public.community": {}},
+            "mongo": mongo_config,
+        }
+        config_version = repository.store(server_config, {"profiles": {}})
+        update = repository._configs.update_one.call_args
+        encoded = update.args[1]["$setOnInsert"]["config"]
+        self.assertNotIn("walked_hosts", encoded)
+        repository._configs.find_one.return_value = {
+            "_id": config_version,
+            "config": encoded,
+        }
+
+        self.assertEqual(
+            (server_config, {"profiles": {}}), repository.load(config_version)
+        )
+        repository._configs.find_one.return_value = None
+        self.assertIsNone(repository.load("missing"))
+
+    def test_old_config_versions_are_deleted(self, mongo_client):
+        repository = ConfigRepository(mongo_config)
+        versions = repository._configs.find.return_value.sort.return_value
+        versions.skip.return_value = [{"_id": "old"}]
+
+        repository.store({"a": 1}, {"profiles": {}})
+
+        versions.skip.assert_called_once_with(ConfigRepository.MAX_VERSIONS)
+        repository._configs.delete_many.assert_called_once_with(
+            {"_id": {"$in": ["old"]}}
+        )
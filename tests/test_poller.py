@@ -18,7 +18,11 @@ from unittest import TestCase
 from unittest.mock import MagicMock, Mock, patch
 
 sys.modules["splunk_connect_for_snmp_poller.manager.celery_client"] = Mock()
+from splunk_connect_for_snmp_poller.manager.data.inventory_record import (  # noqa: E402
+    InventoryRecord,
+)
 from splunk_connect_for_snmp_poller.manager.poller import Poller  # noqa: E402
+from tests.static_inventory_test_data import snapshot  # noqa: E402
 
 
 class TestPollerUtilities(TestCase):
@@ -44,3 +48,100 @@ class TestPollerUtilities(TestCase):
             ):
                 obj.run_enricher_changed_check({}, {"127.0.0.1:161": MagicMock()})
             self.assertEqual(obj._old_enricher, {})
+
+    @patch(
+        "splunk_connect_for_snmp_poller.manager.poller.refresh_inventory_addresses",
+        side_effect=lambda inventory_snapshot: inventory_snapshot,
+    )
+    @patch("splunk_connect_for_snmp_poller.manager.poller.job_scheduler")
+    @patch("splunk_connect_for_snmp_poller.manager.poller.get_profiles")
+    @patch("splunk_connect_for_snmp_poller.manager.poller.load_inventory_snapshot")
+    @patch("splunk_connect_for_snmp_poller.manager.poller.file_was_modified")
+    @patch("splunk_connect_for_snmp_poller.manager.poller.WalkedHostsRepository")
+    def test_check_inventory_only_touches_changed_rows(
+        self,
+        m_repository,
+        m_file_was_modified,
+        m_load_inventory_snapshot,
+        m_get_profiles,
+        m_job_scheduler,
+        m_refresh_inventory_addresses,
+    ):
+        args = Mock(inventory="inventory.csv", config="config.yaml")
+        poller = Poller(args, {"mongo": {}})
+        m_get_profiles.return_value = {"profiles": {"p1": {}}}
+        m_load_inventory_snapshot.return_value = snapshot(
+            InventoryRecord("10.0.0.1", "2c", "public", "p1", "60"),
+            InventoryRecord("10.0.0.2", "2c", "public", "p1", "60"),
+            InventoryRecord("10.0.0.3", "2c", "public", "p1", "60"),
+        )
+        m_file_was_modified.side_effect = [(False, 0), (True, 1)]
+        poller._Poller__check_inventory()
+        self.assertEqual(3, m_job_scheduler.spread_every.call_count)
+        removed_job = poller._jobs_map["10.0.0.3#p1"]
+
+        m_load_inventory_snapshot.return_value = snapshot(
+            InventoryRecord("10.0.0.1", "2c", "public", "p1", "60"),
+            InventoryRecord("10.0.0.2", "2c", "public", "p1", "30"),
+            InventoryRecord("10.0.0.4", "2c", "public", "p1", "60"),
+        )
+        m_file_was_modified.side_effect = [(False, 0), (True, 2)]
+        poller._Poller__check_inventory()
+
+        m_get_profiles.assert_called_once()
+        self.assertEqual(4, m_job_scheduler.spread_every.call_count)
+        m_job_scheduler.update_job.assert_called_once()
+        self.assertEqual(30, m_job_scheduler.update_job.call_args.args[1])
+        m_job_scheduler.cancel_job.assert_called_once_with(removed_job)
+        self.assertEqual(
+            {"10.0.0.1#p1", "10.0.0.2#p1", "10.0.0.4#p1"}, set(poller._jobs_map)
+        )
+        m_repository.return_value.delete_host.assert_called_once_with("10.0.0.3:161")
+        self.assertIs(
+            m_load_inventory_snapshot.return_value, poller.inventory_snapshot()
+        )
+
+    @patch("splunk_connect_for_snmp_poller.manager.poller.refresh_inventory_addresses")
+    @patch("splunk_connect_for_snmp_poller.manager.poller.job_scheduler")
+    @patch("splunk_connect_for_snmp_poller.manager.poller.get_profiles")
+    @patch("splunk_connect_for_snmp_poller.manager.poller.load_inventory_snapshot")
+    @patch("splunk_connect_for_snmp_poller.manager.poller.file_was_modified")
+    @patch("splunk_connect_for_snmp_poller.manager.poller.WalkedHostsRepository")
+    def test_check_inventory_updates_jobs_of_changed_addresses(
+        self,
+        m_repository,
+        m_file_was_modified,
+        m_load_inventory_snapshot,
+        m_get_profiles,
+        m_job_scheduler,
+        m_refresh_inventory_addresses,
+    ):
+        args = Mock(inventory="inventory.csv", config="config.yaml")
+        poller = Poller(args, {"mongo": {}})
+        m_get_profiles.return_value = {"profiles": {"p1": {}}}
+        m_load_inventory_snapshot.return_value = snapshot(
+            InventoryRecord("device1", "2c", "public", "p1", "60", "10.0.0.1"),
+            InventoryRecord("device2", "2c", "public", "p1", "60", "10.0.0.2"),
+        )
+        m_refresh_inventory_addresses.side_effect = lambda inventory_snapshot: (
+            inventory_snapshot
+        )
+        m_file_was_modified.side_effect = [(False, 0), (True, 1)]
+        poller._Poller__check_inventory()
+
+        m_refresh_inventory_addresses.side_effect = None
+        m_refresh_inventory_addresses.return_value = snapshot(
+            InventoryRecord("device1", "2c", "public", "p1", "60", "10.0.0.1"),
+            InventoryRecord("device2", "2c", "public", "p1", "60", "10.0.0.3"),
+        )
+        m_file_was_modified.side_effect = [(False, 0), (False, 1)]
+        poller._Poller__check_inventory()
+
+        m_load_inventory_snapshot.assert_called_once()
+        m_job_scheduler.update_job.assert_called_once()
+        self.assertEqual(
+            "10.0.0.3", m_job_scheduler.update_job.call_args.args[3].address
+        )
+        self.assertIs(
+            m_refresh_inventory_addresses.return_value, poller.inventory_snapshot()
+        )
@@ -13,18 +13,28 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import os
 import sys
+import tempfile
 from unittest import TestCase
-from unittest.mock import Mock
+from unittest.mock import Mock, patch
 
 from splunk_connect_for_snmp_poller.manager.data.inventory_record import InventoryRecord
+from tests.static_inventory_test_data import snapshot
 
 sys.modules["splunk_connect_for_snmp_poller.manager.celery_client"] = Mock()
+from splunk_connect_for_snmp_poller.manager import poller_utilities  # noqa: E402
 from splunk_connect_for_snmp_poller.manager.poller_utilities import (  # noqa: E402
+    automatic_realtime_job,
+    automatic_realtime_task,
     create_poller_scheduler_entry_key,
     deleted_oid_families,
+    diff_inventory,
     get_frequency,
+    get_transport_setting,
     is_ifmib_different,
+    load_inventory_snapshot,
+    refresh_inventory_addresses,
     return_database_id,
     update_inventory_record,
 )
@@ -71,6 +81,26 @@ class TestPollerUtilities(TestCase):
         result = get_frequency(agent, profiles, 60)
         self.assertEqual(result, 60)
 
+    def test_transport_setting_from_inventory_row_overrides_profile(self):
+        profiles = {"profiles": {"some_profile": {"timeout": 2, "retries": 1}}}
+
+        self.assertEqual(
+            0.5,
+            get_transport_setting("0.5", profiles, "some_profile", "timeout", float),
+        )
+        self.assertEqual(
+            1, get_transport_setting("", profiles, "some_profile", "retries", int)
+        )
+        self.assertIsNone(
+            get_transport_setting(None, profiles, "other_profile", "retries", int)
+        )
+        self.assertIsNone(
+            get_transport_setting("x", profiles, "some_profile", "timeout", float)
+        )
+        self.assertIsNone(
+            get_transport_setting("-1", profiles, "some_profile", "retries", int)
+        )
+
     def test_return_default_frequency_when_profile_matched_is_dynamic(self):
         agent = {"profile": "*"}
         profiles = {"profiles": {"some_profile": {"frequency": 20}}}
@@ -320,3 +350,172 @@ class TestPollerUtilities(TestCase):
         self.assertEqual(new_oid_ir.community, "public")
         self.assertEqual(new_oid_ir.version, "v2")
         self.assertEqual(new_oid_ir.host, "127.0.0.1")
+
+    @patch("splunk_connect_for_snmp_poller.manager.poller_utilities.threading.Thread")
+    def test_automatic_realtime_job_skipped_while_previous_sweep_runs(self, m_thread):
+        poller_utilities._realtime_sweep_lock.acquire()
+        try:
+            automatic_realtime_job(Mock(), Mock(), {}, {}, 60, Mock(), False)
+        finally:
+            poller_utilities._realtime_sweep_lock.release()
+
+        m_thread.assert_not_called()
+
+    @patch(
+        "splunk_connect_for_snmp_poller.manager.poller_utilities._extract_sys_uptime_instances"
+    )
+    def test_automatic_realtime_task_skips_hosts_without_answer(
+        self, m_extract_sys_uptime_instances
+    ):
+        inventory_snapshot = snapshot(
+            InventoryRecord("192.168.0.1", "2c", "public", "profile1", "60"),
+            InventoryRecord("192.168.0.1", "2c", "public", "profile2", "60"),
+            InventoryRecord("192.168.0.2", "2c", "public", "profile1", "60"),
+        )
+        sys_up_time = {"1.3.6.1.2.1.1.3.0": {"value": "100", "type": "TimeTicks"}}
+        m_extract_sys_uptime_instances.return_value = {"192.168.0.1:161": sys_up_time}
+        mongo = Mock()
+        sys_descr = {"1.3.6.1.2.1.1.1.0": {"value": "Linux", "type": "OctetString"}}
+        mongo.real_time_state_for.return_value = {
+            "192.168.0.1:161": (True, {**sys_up_time, **sys_descr})
+        }
+
+        automatic_realtime_task(
+            mongo, lambda: inventory_snapshot, {}, {}, 60, Mock(), False
+        )
+
+        self.assertEqual(
+            ["192.168.0.1:161", "192.168.0.2:161"],
+            list(m_extract_sys_uptime_instances.call_args.args[0].keys()),
+        )
+        mongo.update_real_time_state.assert_called_once_with(
+            {"192.168.0.1:161": sys_up_time}, set(), "walked_first_time"
+        )
+
+    @patch(
+        "splunk_connect_for_snmp_poller.manager.poller_utilities._extract_sys_uptime_instances"
+    )
+    @patch("splunk_connect_for_snmp_poller.manager.poller_utilities.job_scheduler")
+    def test_automatic_realtime_task_walks_new_and_restarted_hosts(
+        self, m_job_scheduler, m_extract_sys_uptime_instances
+    ):
+        inventory_snapshot = snapshot(
+            InventoryRecord("192.168.0.1", "2c", "public", "profile1", "60"),
+            InventoryRecord("192.168.0.2", "2c", "public", "profile1", "60"),
+            InventoryRecord("192.168.0.3", "2c", "public", "profile1", "60"),
+        )
+
+        def sys_up_time(value):
+            return {"1.3.6.1.2.1.1.3.0": {"value": value, "type": "TimeTicks"}}
+
+        m_extract_sys_uptime_instances.return_value = {
+            "192.168.0.1:161": sys_up_time("100"),
+            "192.168.0.2:161": sys_up_time("100"),
+            "192.168.0.3:161": sys_up_time("100"),
+        }
+        mongo = Mock()
+        mongo.real_time_state_for.return_value = {
+            "192.168.0.1:161": (True, sys_up_time("50")),
+            "192.168.0.2:161": (True, sys_up_time("200")),
+        }
+
+        automatic_realtime_task(
+            mongo, lambda: inventory_snapshot, {}, {}, 60, Mock(), True
+        )
+
+        mongo.real_time_state_for.assert_called_once()
+        real_time_data, walked_hosts, _ = mongo.update_real_time_state.call_args.args
+        self.assertEqual(3, len(real_time_data))
+        self.assertEqual({"192.168.0.2:161", "192.168.0.3:161"}, walked_hosts)
+        walked_record = m_job_scheduler.once.call_args_list[0].args[2]
+        self.assertEqual("1.3.6.1.*", walked_record.profile)
+        # the records of the shared snapshot are left untouched
+        self.assertEqual(
+            {"profile1"},
+            {ir.profile for ir in inventory_snapshot.records.values()},
+        )
+
+    @patch("splunk_connect_for_snmp_poller.manager.poller_utilities.host_resolver")
+    def test_refresh_inventory_addresses(self, m_host_resolver):
+        inventory_snapshot = snapshot(
+            InventoryRecord("device1:1161", "2c", "public", "p1", "60", "10.0.0.1"),
+            InventoryRecord("device2", "2c", "public", "p1", "60", "10.0.0.2"),
+        )
+        m_host_resolver.resolve.side_effect = {
+            "device1": "10.0.0.1",
+            "device2": "10.0.0.3",
+        }.get
+
+        refreshed = refresh_inventory_addresses(inventory_snapshot)
+
+        m_host_resolver.resolve_all.assert_called_once_with({"device1", "device2"})
+        self.assertEqual("10.0.0.1", refreshed.records["device1:1161#p1"].address)
+        self.assertEqual("10.0.0.3", refreshed.records["device2#p1"].address)
+        self.assertEqual("version", refreshed.version)
+        self.assertEqual("10.0.0.2", inventory_snapshot.records["device2#p1"].address)
+
+    @patch("splunk_connect_for_snmp_poller.manager.poller_utilities.host_resolver")
+    def test_refresh_inventory_addresses_keeps_last_known_address(
+        self, m_host_resolver
+    ):
+        inventory_snapshot = snapshot(
+            InventoryRecord("device1", "2c", "public", "p1", "60", "10.0.0.1"),
+        )
+        m_host_resolver.resolve.return_value = None
+
+        self.assertIs(
+            inventory_snapshot, refresh_inventory_addresses(inventory_snapshot)
+        )
+
+    def test_diff_inventory(self):
+        old = {
+            "10.0.0.1#p1": InventoryRecord("10.0.0.1", "2c", "public", "p1", "60"),
+            "10.0.0.2#p1": InventoryRecord("10.0.0.2", "2c", "public", "p1", "60"),
+            "10.0.0.3#p1": InventoryRecord("10.0.0.3", "2c", "public", "p1", "60"),
+        }
+        new = {
+            "10.0.0.1#p1": InventoryRecord("10.0.0.1", "2c", "public", "p1", "60"),
+            "10.0.0.2#p1": InventoryRecord("10.0.0.2", "2c", "public", "p1", "30"),
+            "10.0.0.4#p1": InventoryRecord("10.0.0.4", "2c", "public", "p1", "60"),
+        }
+
+        diff = diff_inventory(old, new)
+
+        self.assertEqual({"10.0.0.4#p1"}, diff.added)
+        self.assertEqual({"10.0.0.3#p1"}, diff.removed)
+        self.assertEqual({"10.0.0.2#p1"}, diff.changed)
+
+    @patch(
+        "splunk_connect_for_snmp_poller.manager.poller_utilities.host_resolver.resolve"
+    )
+    def test_load_inventory_snapshot_is_reused_until_content_changes(self, m_resolve):
+        m_resolve.return_value = "10.0.0.1"
+        profiles = {"profiles": {"p1": {"frequency": 30}}}
+        with tempfile.TemporaryDirectory() as directory:
+            inventory_file_path = os.path.join(directory, "inventory.csv")
+            with open(inventory_file_path, "w") as inventory_file:
+                inventory_file.write(
+                    "host,version,community,profile,freqinseconds\n"
+                    "10.0.0.1,2c,public,p1,\n"
+                    "10.0.0.1,2c,public,p1,\n"
+                    "10.0.0.1,2c,public,p2,\n"
+                )
+
+            first = load_inventory_snapshot(inventory_file_path, profiles)
+            same = load_inventory_snapshot(inventory_file_path, profiles, first)
+            other_profiles = load_inventory_snapshot(
+                inventory_file_path, dict(profiles), first
+            )
+            with open(inventory_file_path, "a") as inventory_file:
+                inventory_file.write("10.0.0.2,2c,public,p1,\n")
+            changed = load_inventory_snapshot(inventory_file_path, profiles, first)
+
+        self.assertEqual({"10.0.0.1#p1", "10.0.0.1#p2"}, set(first.records))
+        self.assertEqual(30, first.records["10.0.0.1#p1"].frequency_str)
+        self.assertEqual("10.0.0.1", first.records["10.0.0.1#p1"].address)
+        self.assertEqual(2, len(first.by_host["10.0.0.1"]))
+        self.assertEqual(1, len(first.by_profile["p2"]))
+        self.assertIs(first, same)
+        self.assertIsNot(first, other_profiles)
+        self.assertEqual(3, len(changed))
+        self.assertNotEqual(first.version, changed.version)
@@ -13,10 +13,13 @@
 # limitations under the License.
 #
 from unittest import TestCase
+from unittest.mock import patch
 
 from splunk_connect_for_snmp_poller.manager.profile_matching import (
     assign_profiles_to_device,
     extract_desc,
+    get_profiles,
+    varbinds_hash,
 )
 from splunk_connect_for_snmp_poller.manager.realtime.oid_constant import OidConstant
 
@@ -112,3 +115,28 @@ class TestProfileMatching(TestCase):
             profiles, ("My zeus device", None), "localhost"
         )
         self.assertEqual(len(result), 0)
+
+    def test_varbinds_hash_depends_only_on_varbinds(self):
+        profile = {"frequency": 20, "varBinds": [["IF-MIB", "ifMtu"], "1.3.6.1.*"]}
+        same_varbinds = {
+            "frequency": 60,
+            "varBinds": [["IF-MIB", "ifMtu"], "1.3.6.1.*"],
+        }
+        other_varbinds = {"frequency": 20, "varBinds": [["IF-MIB", "ifDescr"]]}
+        self.assertEqual(varbinds_hash(profile), varbinds_hash(same_varbinds))
+        self.assertNotEqual(varbinds_hash(profile), varbinds_hash(other_varbinds))
+
+    @patch(
+        "splunk_connect_for_snmp_poller.manager.profile_matching.get_mib_profiles",
+        return_value="",
+    )
+    def test_get_profiles_leaves_server_config_untouched(self, m_get_mib_profiles):
+        server_config = {"profiles": {"p1": {"varBinds": ["1.3.6.1.*"]}}}
+
+        profiles = get_profiles(server_config)
+
+        self.assertEqual({"p1": {"varBinds": ["1.3.6.1.*"]}}, server_config["profiles"])
+        self.assertEqual(
+            varbinds_hash(server_config["profiles"]["p1"]),
+            profiles["profiles"]["p1"]["varBindsHash"],
+        )
@@ -0,0 +1,168 @@
+#
+# Copyright 2021 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from unittest import TestCase
+from unittest.mock import Mock
+
+from splunk_connect_for_snmp_poller.manager.scheduler import CancelJob, Scheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestScheduler(TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.scheduler = Scheduler(clock=self.clock)
+
+    def test_periodic_job_runs_every_interval(self):
+        job_func = Mock(return_value=None)
+        self.scheduler.every(10, job_func, "arg")
+
+        self.scheduler.run_pending()
+        job_func.assert_not_called()
+
+        self.clock.now += 10
+        self.scheduler.run_pending()
+        self.clock.now += 10
+        self.scheduler.run_pending()
+
+        self.assertEqual(2, job_func.call_count)
+        job_func.assert_called_with("arg")
+        self.assertEqual(10, self.scheduler.idle_seconds())
+
+    def test_one_shot_job_runs_once(self):
+        job_func = Mock(return_value=None)
+        self.scheduler.once(1, job_func)
+
+        for _ in range(3):
+            self.clock.now += 1
+            self.scheduler.run_pending()
+
+        job_func.assert_called_once()
+        self.assertIsNone(self.scheduler.idle_seconds())
+
+    def test_job_returning_cancel_job_is_removed(self):
+        job_func = Mock(return_value=CancelJob)
+        self.scheduler.every(1, job_func)
+
+        for _ in range(3):
+            self.clock.now += 1
+            self.scheduler.run_pending()
+
+        job_func.assert_called_once()
+
+    def test_cancelled_job_is_not_run(self):
+        job_func = Mock(return_value=None)
+        job = self.scheduler.every(5, job_func)
+
+        self.scheduler.cancel_job(job)
+        self.clock.now += 5
+        self.scheduler.run_pending()
+
+        job_func.assert_not_called()
+        self.assertIsNone(self.scheduler.idle_seconds())
+
+    def test_update_job_keeps_earlier_next_run(self):
+        old_func, new_func = Mock(return_value=None), Mock(return_value=None)
+        job = self.scheduler.every(60, old_func)
+
+        self.clock.now += 50
+        self.scheduler.update_job(job, 30, new_func)
+        self.assertEqual(10, self.scheduler.idle_seconds())
+
+        self.scheduler.update_job(job, 5, new_func)
+        self.assertEqual(5, self.scheduler.idle_seconds())
+
+        self.clock.now += 5
+        self.scheduler.run_pending()
+        old_func.assert_not_called()
+        new_func.assert_called_once()
+        self.assertEqual(5, self.scheduler.idle_seconds())
+
+    def test_failing_job_stays_scheduled(self):
+        job_func = Mock(side_effect=ValueError)
+        self.scheduler.every(1, job_func)
+
+        for _ in range(2):
+            self.clock.now += 1
+            self.scheduler.run_pending()
+
+        self.assertEqual(2, job_func.call_count)
+
+    def test_failing_after_run_pending_keeps_running(self):
+        job_func = Mock(return_value=None)
+        self.scheduler.every(10, job_func)
+        self.clock.now += 10
+
+        def after_run_pending():
+            self.clock.now += 10
+            if after_run_pending_mock.call_count > 1:
+                raise KeyboardInterrupt
+            raise ValueError
+
+        after_run_pending_mock = Mock(side_effect=after_run_pending)
+        with self.assertRaises(KeyboardInterrupt):
+            self.scheduler.run_forever(after_run_pending=after_run_pending_mock)
+
+        self.assertEqual(2, after_run_pending_mock.call_count)
+        self.assertEqual(2, job_func.call_count)
+
+    def test_spread_jobs_run_at_their_phase(self):
+        first, second = Mock(return_value=None), Mock(return_value=None)
+        first_job = self.scheduler.spread_every(60, "10.0.0.1#profile", first)
+        second_job = self.scheduler.spread_every(60, "10.0.0.2#profile", second)
+
+        self.assertNotEqual(first_job.next_run, second_job.next_run)
+        for job in (first_job, second_job):
+            self.assertEqual(
+                Scheduler.phase(job.spread_key, 60), round(job.next_run % 60, 3)
+            )
+            self.assertTrue(self.clock.now < job.next_run <= self.clock.now + 60)
+
+        self.clock.now = first_job.next_run
+        self.scheduler.run_pending()
+        first.assert_called_once()
+        self.assertAlmostEqual(self.clock.now + 60, first_job.next_run)
+
+    def test_phase_is_deterministic(self):
+        self.assertEqual(
+            Scheduler.phase("10.0.0.1#profile", 60),
+            Scheduler.phase("10.0.0.1#profile", 60),
+        )
+        self.assertTrue(0 <= Scheduler.phase("10.0.0.1#profile", 60) < 60)
+
+    def test_update_job_keeps_phase(self):
+        job = self.scheduler.spread_every(60, "10.0.0.1#profile", Mock())
+        next_run = job.next_run
+
+        self.clock.now += 10
+        self.scheduler.update_job(job, 60, Mock())
+
+        self.assertEqual(next_run, job.next_run)
+
+    def test_jitter_is_bounded(self):
+        scheduler = Scheduler(clock=self.clock, jitter=100)
+        job = scheduler.spread_every(60, "10.0.0.1#profile", Mock())
+        slot = (
+            self.clock.now - (self.clock.now - Scheduler.phase(job.spread_key, 60)) % 60
+        )
+
+        self.assertTrue(slot + 60 <= job.next_run <= slot + 90)
@@ -13,18 +13,36 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import os
+import tempfile
 from unittest import TestCase
 from unittest.mock import MagicMock, patch
 
+from pysnmp.proto import errind
+from pysnmp.proto.rfc1902 import ObjectName, OctetString
+from pysnmp.proto.rfc1905 import errorStatus
 from pysnmp.smi.rfc1902 import ObjectIdentity
 
 from splunk_connect_for_snmp_poller.manager.task_utilities import (
+    BulkObservation,
+    EnrichmentSnapshot,
+    MibViewCache,
+    SnmpAuthCache,
     _sort_walk_data,
+    adapt_max_repetitions,
+    collect_real_time_data,
+    get_walk_max_repetitions,
     is_metric_data,
     is_oid,
+    mib_source_version,
     mib_string_handler,
     parse_port,
+    process_bulk_responses,
     process_one_time_flag,
+    store_real_time_data,
+    transport_options,
+    update_learned_max_repetitions,
+    walk_cmd,
 )
 from splunk_connect_for_snmp_poller.utilities import OnetimeFlag
 
@@ -258,3 +276,215 @@ class TestTaskUtilities(TestCase):
             oid = mib_string_handler([["IF-MIB", "ifMtu", 1, ""]])
         self.assertEqual(len(oid.get), 0)
         self.assertEqual(len(oid.bulk), 0)
+
+    def test_mib_view_cache_resolves_once(self):
+        cache = MibViewCache()
+        first = cache.resolve(["SNMPv2-MIB", "sysDescr", 0], "file:///tmp/mibs")
+        second = cache.resolve(["SNMPv2-MIB", "sysDescr", 0], "file:///tmp/mibs")
+        self.assertEqual(str(first), "1.3.6.1.2.1.1.1.0")
+        self.assertIs(first, second)
+
+    def test_mib_view_cache_rebuilt_when_sources_change(self):
+        cache = MibViewCache()
+        first = cache.resolve(["SNMPv2-MIB", "sysDescr", 0], "file:///tmp/mibs")
+        second = cache.resolve(["SNMPv2-MIB", "sysDescr", 0], "file:///tmp/other")
+        self.assertEqual(str(first), str(second))
+        self.assertIsNot(first, second)
+
+    def test_mib_view_cache_dropped_when_local_mib_files_change(self):
+        now = [0]
+        cache = MibViewCache(check_interval=60, clock=lambda: now[0])
+        with tempfile.TemporaryDirectory() as directory:
+            mib_sources = f"file://{directory}/@mib@"
+            mib_file = os.path.join(directory, "TEST-MIB.txt")
+            with open(mib_file, "w") as f:
+                f.write("")
+            os.utime(mib_file, (1000, 1000))
+            os.utime(directory, (1000, 1000))
+            generation = cache.generation(mib_sources)
+
+            os.utime(mib_file, (2000, 2000))
+            self.assertEqual(generation, cache.generation(mib_sources))
+            now[0] = 60
+            self.assertNotEqual(generation, cache.generation(mib_sources))
+
+    def test_mib_source_version_of_remote_location(self):
+        self.assertIsNone(mib_source_version("http://mib_server/files/@mib@"))
+
+    def test_enrichment_snapshot_reads_mongo_once(self):
+        mongo = MagicMock()
+        mongo.static_data_for.return_value = {"IF-MIB": {}}
+        enrichment = EnrichmentSnapshot(mongo, True, "127.0.0.1:161")
+        first_enricher, first_multimetric = enrichment.get()
+        second_enricher, second_multimetric = enrichment.get()
+        mongo.static_data_for.assert_called_once_with("127.0.0.1:161")
+        self.assertIs(first_enricher, second_enricher)
+        self.assertTrue(first_multimetric)
+
+    def test_enrichment_snapshot_without_enricher(self):
+        mongo = MagicMock()
+        enrichment = EnrichmentSnapshot(mongo, False, "127.0.0.1:161")
+        self.assertEqual(enrichment.get(), (None, False))
+        self.assertFalse(mongo.static_data_for.called)
+
+    @patch(
+        "splunk_connect_for_snmp_poller.manager.task_utilities.post_data_to_splunk_hec"
+    )
+    @patch(
+        "splunk_connect_for_snmp_poller.manager.task_utilities.get_translated_string",
+        return_value=("result", True),
+    )
+    def test_process_bulk_responses_stops_at_error(
+        self, m_get_translated_string, m_post
+    ):
+        enrichment = MagicMock()
+        enrichment.get.return_value = (None, False)
+        responses = [
+            (None, 0, 0, [ObjectTypeMock("1"), ObjectTypeMock("2")]),
+            ("timeout", 0, 0, []),
+            (None, 0, 0, [ObjectTypeMock("3")]),
+        ]
+
+        process_bulk_responses(
+            responses, enrichment, MagicMock(), "host", "url", {}, "", None, None
+        )
+
+        self.assertEqual(2, m_get_translated_string.call_count)
+        self.assertEqual(3, m_post.call_count)
+
+    def test_snmp_auth_cache_reuses_objects(self):
+        cache = SnmpAuthCache()
+        server_config = {"communities": {"public": {"communityIndex": "public"}}}
+
+        first = cache.get("2c", "public", server_config)
+        second = cache.get("2c", "public", server_config)
+
+        self.assertIs(first[0], second[0])
+        self.assertIs(first[1], second[1])
+        self.assertIsNot(first[0], cache.get("1", "public", server_config)[0])
+
+    def test_snmp_auth_cache_rebuilds_when_credentials_change(self):
+        cache = SnmpAuthCache()
+        server_config = {"usernames": {"user": {"authKey": "authkey1"}}}
+        first_auth_data, _ = cache.get("3", "user", server_config)
+
+        server_config["usernames"]["user"]["authKey"] = "authkey2"
+        second_auth_data, _ = cache.get("3", "user", server_config)
+
+        self.assertIsNot(first_auth_data, second_auth_data)
+        self.assertEqual("authkey2", second_auth_data.authKey)
+
+    def test_get_walk_max_repetitions(self):
+        server_config = {
+            "walk": {
+                "maxRepetitions": 40,
+                "devices": {"10.0.0.1:161": {"maxRepetitions": 10}},
+            }
+        }
+
+        self.assertEqual(10, get_walk_max_repetitions(server_config, "10.0.0.1:161"))
+        self.assertEqual(40, get_walk_max_repetitions(server_config, "10.0.0.2:161"))
+        self.assertEqual(25, get_walk_max_repetitions({}, "10.0.0.1:161"))
+
+    @patch("splunk_connect_for_snmp_poller.manager.task_utilities.nextCmd")
+    @patch("splunk_connect_for_snmp_poller.manager.task_utilities.bulkCmd")
+    def test_walk_cmd_uses_getbulk_except_for_snmp_v1(self, m_bulk_cmd, m_next_cmd):
+        walk_cmd("engine", "auth", "target", "context", "2c", "1.3.6.1", 30)
+
+        m_next_cmd.assert_not_called()
+        self.assertEqual(
+            ("engine", "auth", "target", "context", 0, 30),
+            m_bulk_cmd.call_args.args[:6],
+        )
+        self.assertFalse(m_bulk_cmd.call_args.kwargs["lexicographicMode"])
+
+        walk_cmd("engine", "auth", "target", "context", "1", "1.3.6.1", 30)
+
+        m_bulk_cmd.assert_called_once()
+        m_next_cmd.assert_called_once()
+
+    def observe(self, responses):
+        observation = BulkObservation()
+        list(observation.observe(responses))
+        return observation
+
+    def test_adapt_max_repetitions(self):
+        rows = [(None, 0, 0, [("oid", "value")])] * 60
+
+        self.assertEqual(62, adapt_max_repetitions(50, self.observe(rows)))
+        self.assertEqual(50, adapt_max_repetitions(50, self.observe(rows[:30])))
+        self.assertEqual(200, adapt_max_repetitions(190, self.observe(rows * 4)))
+
+        too_big = (None, errorStatus.clone("tooBig"), 0, [])
+        self.assertEqual(
+            25, adapt_max_repetitions(50, self.observe(rows[:10] + [too_big]))
+        )
+        timeout = (errind.requestTimedOut, 0, 0, [])
+        self.assertEqual(5, adapt_max_repetitions(6, self.observe([timeout])))
+        other_error = (errind.unknownSecurityName, 0, 0, [])
+        self.assertEqual(50, adapt_max_repetitions(50, self.observe([other_error])))
+
+    def test_update_learned_max_repetitions_keeps_lowest_value_per_host(self):
+        mongo_connection = MagicMock()
+        rows = [(None, 0, 0, [("oid", "value")])] * 60
+        timeout = (errind.requestTimedOut, 0, 0, [])
+
+        update_learned_max_repetitions(
+            mongo_connection,
+            [
+                ("host1:161", 50, self.observe(rows)),
+                ("host1:161", 50, self.observe([timeout])),
+                ("host2:161", 50, self.observe(rows)),
+                ("host3:161", 50, self.observe(rows[:10])),
+            ],
+        )
+
+        mongo_connection.update_max_repetitions.assert_called_once_with(
+            {"host1:161": 25, "host2:161": 62}
+        )
+
+    def test_transport_options_leave_out_unset_values(self):
+        self.assertEqual({}, transport_options(None, None))
+        self.assertEqual({"timeout": 0.5, "retries": 0}, transport_options(0.5, 0))
+
+    def test_walk_collects_real_time_data_in_memory(self):
+        def row(oid, value):
+            name = MagicMock()
+            name.getOid.return_value = ObjectName(oid)
+            return [(name, OctetString(value))]
+
+        real_time_data = {}
+        collect_real_time_data(real_time_data, row("1.3.6.1.2.1.1.1.0", "Linux"))
+        collect_real_time_data(real_time_data, row("1.3.6.1.2.1.1.1.1", "other"))
+        collect_real_time_data(real_time_data, row("1.3.6.1.2.1.1.2.0", "1.3.6.1.4"))
+        collect_real_time_data(real_time_data, [])
+
+        self.assertEqual(
+            {
+                "1.3.6.1.2.1.1.1.0": {"value": "Linux", "type": "str"},
+                "1.3.6.1.2.1.1.2.0": {"value": "1.3.6.1.4", "type": "str"},
+            },
+            real_time_data,
+        )
+
+    def test_store_real_time_data_merges_with_one_write(self):
+        mongo_connection = MagicMock()
+        mongo_connection.real_time_data_for.return_value = {
+            "1.3.6.1.2.1.1.3.0": {"value": "100", "type": "TimeTicks"}
+        }
+
+        store_real_time_data("host:161", mongo_connection, {})
+        mongo_connection.real_time_data_for.assert_not_called()
+
+        store_real_time_data(
+            "host:161",
+            mongo_connection,
+            {"1.3.6.1.2.1.1.1.0": {"value": "Linux", "type": "str"}},
+        )
+        mongo_connection.update_real_time_data_for.assert_called_once_with(
+            "host:161",
+            {
+                "1.3.6.1.2.1.1.3.0": {"value": "100", "type": "TimeTicks"},
+                "1.3.6.1.2.1.1.1.0": {"value": "Linux", "type": "str"},
+            },
+        )
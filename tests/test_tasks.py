@@ -23,7 +23,12 @@ sys.modules["splunk_connect_for_snmp_poller.manager.celery_client"] = Mock()
 from splunk_connect_for_snmp_poller.manager.task_utilities import (  # noqa: E402
     VarbindCollection,
 )
-from splunk_connect_for_snmp_poller.manager.tasks import sort_varbinds  # noqa: E402
+from splunk_connect_for_snmp_poller.manager.tasks import (  # noqa: E402
+    _config_versions,
+    compile_profile,
+    load_config_version,
+    sort_varbinds,
+)
 
 
 def cast_helper(varbind):
@@ -73,3 +78,54 @@ class TestTasks(TestCase):
         varbinds_result = VarbindCollection(bulk=[], get=[])
         actual_result = sort_varbinds(varbinds)
         self.assertEqual(actual_result.__dict__, varbinds_result.__dict__)
+
+    def test_compile_profile_is_cached_by_hash(self):
+        profile = {"varBinds": ["1.3.6.1.2.1.2.*"], "varBindsHash": "first"}
+        with patch(
+            "splunk_connect_for_snmp_poller.manager.tasks.sort_varbinds",
+            wraps=sort_varbinds,
+        ) as mock:
+            first = compile_profile(profile)
+            second = compile_profile(dict(profile))
+        self.assertIs(first, second)
+        self.assertEqual(mock.call_count, 1)
+
+    def test_compile_profile_recompiled_for_new_version(self):
+        first = compile_profile({"varBinds": ["1.3.6.1.2.1.2.*"]})
+        second = compile_profile({"varBinds": ["1.3.6.1.2.1.2.1"]})
+        self.assertEqual(len(first.bulk), 1)
+        self.assertEqual(len(second.get), 1)
+
+    def test_compile_profile_not_cached_when_varbind_fails(self):
+        profile = {
+            "varBinds": ["1.3.6.1.2.1.2.*", ["SNMPv2-MIB", "sysUpTime", 0, 1]],
+            "varBindsHash": "partial",
+        }
+        with patch(
+            "splunk_connect_for_snmp_poller.manager.tasks.sort_varbinds",
+            wraps=sort_varbinds,
+        ) as mock:
+            first = compile_profile(profile)
+            compile_profile(dict(profile))
+        self.assertEqual(len(first.bulk), 1)
+        self.assertEqual(mock.call_count, 2)
+
+    @patch("splunk_connect_for_snmp_poller.manager.tasks.ConfigRepository")
+    def test_config_version_is_loaded_once(self, m_config_repository):
+        _config_versions.clear()
+        m_config_repository.return_value.load.return_value = ({"mongo": {}}, {})
+
+        first = load_config_version({}, "version1")
+        second = load_config_version({}, "version1")
+
+        self.assertIs(first, second)
+        m_config_repository.return_value.load.assert_called_once_with("version1")
+
+    @patch("splunk_connect_for_snmp_poller.manager.tasks.ConfigRepository")
+    def test_missing_config_version_is_not_cached(self, m_config_repository):
+        _config_versions.clear()
+        m_config_repository.return_value.load.return_value = None
+
+        self.assertIsNone(load_config_version({}, "version1"))
+        self.assertIsNone(load_config_version({}, "version1"))
+        self.assertEqual(2, m_config_repository.return_value.load.call_count)